@@ -1,126 +1,273 @@
-import streamlit as st
-import pandas as pd
 import os
-import matplotlib.pyplot as plt
-import io # Required for in-memory file operations for Excel
+
+import streamlit as st
+from streamlit.errors import StreamlitAPIException
+# Heavy dependencies (pandas, matplotlib, xlsxwriter) are imported by the helper
+# modules only on the code paths that need them.
+from config_jarrones import mes_options, porcentajes, subcategorias_listas
+from usuarios import obtener_historial, usuario_actual
+from gastos_sesion import GastosSesion
+from diario_gastos import DiarioGastos, ruta_diario
+from dinero import a_centavos, a_pesos, formatear, parse_monto
+from motor_jarrones import admitir_en_orden, excedente, filas_historial, repartir_ingreso
+from historial_cache import cargar_resumenes, estadisticas_cache, exportar
+from resumenes import resumen_anual_simplificado, resumen_mensual_simplificado
+from graficos import datos_desde_sesion, renderizar_figura, totales_por_jarron
+from categorizacion import Categorizador, ruta_categorias_aprendidas
+from extractos import categorizar_extracto
+from instrumentacion import MedicionRerun, cronometrado, iniciar_perfil
 
 # --- Basic Streamlit Page Configuration ---
 st.set_page_config(page_title="App 6 Jarrones", layout="wide")
 st.title("💰 App de los 6 Jarrones con Subcategorías")
 
-# --- Session State Initialization ---
-# Use st.session_state to remember expenses as they are added across reruns
-# Ensure this is initialized robustly on app start or reload
-if 'jarron_gastos' not in st.session_state:
-    st.session_state.jarron_gastos = {}
-    # Initialize an empty list for each jar (jarrón) to store expenses
-    for jarron_name in [
-        "Gastos básicos", "Inversiones a largo plazo", "Educación",
-        "Invertir", "Diversión", "Donar"
-    ]:
-        st.session_state.jarron_gastos[jarron_name] = []
-# Ensure existing jarron_gastos have all expected jars if reloading an old session state
-else:
-    for jarron_name in [
-        "Gastos básicos", "Inversiones a largo plazo", "Educación",
-        "Invertir", "Diversión", "Donar"
-    ]:
-        if jarron_name not in st.session_state.jarron_gastos:
-            st.session_state.jarron_gastos[jarron_name] = []
+# --- Rerun Instrumentation ---
+# Section timings of this run go to the rotating JSONL log and, optionally, to
+# the debug panel in the sidebar. A single run can be profiled with the
+# "?perfil=cprofile" (or "pyinstrument") query parameter, or the first run of
+# each session with the JARRONES_PERFIL environment variable.
+medicion = MedicionRerun()
+perfilador = None
+herramienta_perfil = st.query_params.get("perfil")
+if herramienta_perfil is not None:
+    del st.query_params["perfil"] # Capture only this run
+elif os.environ.get("JARRONES_PERFIL") and not st.session_state.get("_perfil_capturado"):
+    herramienta_perfil = os.environ["JARRONES_PERFIL"]
+    st.session_state._perfil_capturado = True
+if herramienta_perfil is not None:
+    perfilador = iniciar_perfil(herramienta_perfil)
+
+panel_rendimiento = None
+if st.sidebar.toggle("Panel de rendimiento", value=False, key="panel_rendimiento"):
+    panel_rendimiento = st.sidebar.container() # Filled in when the run finishes
+
+# History cache statistics (cumulative for this server process), filled in
+# when the run finishes so they include this run's lookups
+with st.sidebar.expander("Estado de la caché del historial"):
+    estado_cache = st.empty()
+
+def finalizar_rerun(mostrar_panel=True):
+    """Close this run's measurement: stop the profiler, log it and fill the debug panel and cache counters."""
+    if medicion.cerrada:
+        return
+    if perfilador is not None:
+        medicion.perfil = perfilador.detener()
+    medicion.cerrar()
+    if mostrar_panel:
+        stats_cache = estadisticas_cache()
+        estado_cache.write(f"Aciertos: {stats_cache['aciertos']} · Fallos: {stats_cache['fallos']}")
+    if mostrar_panel and panel_rendimiento is not None:
+        with panel_rendimiento:
+            st.caption(f"Última ejecución: {medicion.total * 1000:.1f} ms")
+            st.dataframe(
+                [
+                    {"Sección": s["seccion"], "ms": round(s["segundos"] * 1000, 2), "Filas": s["filas"]}
+                    for s in medicion.secciones
+                ],
+                hide_index=True
+            )
+            if perfilador is not None:
+                st.caption(f"Perfil ({perfilador.herramienta}) guardado en {perfilador.ruta}")
+                st.code(perfilador.resumen, language=None)
+
+def detener():
+    # st.stop() ends the script here, so the run is closed first
+    finalizar_rerun()
+    st.stop()
+
+# --- History Store ---
+# Each user has a separate history partition (see usuarios.py).
+# Write-ahead journal of the user's in-progress month (see diario_gastos)
+@st.cache_resource
+def obtener_diario(usuario):
+    return DiarioGastos(ruta_diario(usuario), obtener_historial(usuario))
+
+usuario = usuario_actual()
+diario = obtener_diario(usuario)
+
+# --- In-Progress Month Restore ---
+# A new session picks up the month left in progress (browser refresh, closed
+# tab or server restart) from the journal. The restored income, month and year
+# become the defaults of the inputs below.
+if "jarron_gastos" not in st.session_state:
+    (
+        st.session_state.jarron_gastos,
+        st.session_state.contexto_restaurado,
+        st.session_state.cambios_sin_guardar,
+    ) = diario.restaurar()
+    st.session_state.contexto_diario = st.session_state.contexto_restaurado
+contexto_restaurado = st.session_state.get("contexto_restaurado", {})
+
+# Chart rendering option: Streamlit's native charts skip matplotlib entirely
+graficos_nativos = st.sidebar.toggle("Gráficos nativos (más rápidos)", value=False, key="graficos_nativos")
 
 
 # --- User Input Section (Section 1) ---
 st.header("1. Ingresa tus datos mensuales")
 
-# Monthly Income Field (modified to appear empty initially)
-# Use st.text_input so it can start empty, then convert to float
-ingreso_str = st.text_input("Ingresa tu ingreso mensual total ($)", value="", placeholder="Ej: 2500000.00")
+if st.session_state.get("cambios_sin_guardar"):
+    col_restaurado, col_descartar = st.columns([0.8, 0.2])
+    with col_restaurado:
+        n_cambios = st.session_state.cambios_sin_guardar
+        st.info(f"Se restauró tu mes en curso con {n_cambios} cambio{'s' if n_cambios != 1 else ''} sin guardar.")
+    with col_descartar:
+        if st.button("🗑️ Empezar de cero", key="descartar_borrador"):
+            diario.descartar()
+            for clave in ("jarron_gastos", "contexto_restaurado", "contexto_diario", "cambios_sin_guardar"):
+                st.session_state.pop(clave, None)
+            finalizar_rerun(mostrar_panel=False)
+            st.rerun()
+
+# Monthly Income Field (empty initially unless a month in progress was restored)
+# Use st.text_input so it can start empty, then convert to integer cents
+ingreso_str = st.text_input(
+    "Ingresa tu ingreso mensual total ($)",
+    value=contexto_restaurado.get("ingreso", ""),
+    placeholder="Ej: 2500000.00"
+)
 
-ingreso = 0.0 # Default value if the field is empty or invalid
-if ingreso_str: # Only try to convert if the field is not empty
-    try:
-        # Replace comma with dot to ensure float conversion works for different locales
-        ingreso = float(ingreso_str.replace(",", "."))
-        if ingreso < 0:
-            st.error("El ingreso no puede ser un valor negativo.")
-            st.stop() # Stop execution if income is negative
-    except ValueError:
-        st.error("Por favor, ingresa un número válido para tu ingreso mensual.")
-        st.stop() # Stop execution if input is not a valid number
-
-# Validate that income is greater than 0 before proceeding
-if ingreso <= 0:
-    st.warning("Por favor, ingresa un ingreso mensual válido para continuar con la distribución.")
-    st.stop() # Stop execution if income is 0 or negative
-
-# Month Field (modified to appear with "Selecciona un Mes" initially)
-mes_options = [
-    "Selecciona un Mes", # New initial option
-    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
-]
-mes = st.selectbox("Mes", options=mes_options, index=0) # index=0 to start with "Selecciona un Mes"
-
-# Month Validation
-if mes == "Selecciona un Mes":
-    st.warning("Por favor, selecciona un mes válido para continuar.")
-    st.stop() # Stop execution of the rest of the app until a valid month is selected
-
-# Year Field (kept with default value, common for years)
-año = st.number_input("Año", min_value=2000, max_value=2100, value=2025)
-
-# --- Jar Percentages ---
-porcentajes = {
-    "Gastos básicos": 0.55,
-    "Inversiones a largo plazo": 0.10,
-    "Educación": 0.10,
-    "Invertir": 0.10,
-    "Diversión": 0.10,
-    "Donar": 0.05
-}
-
-# --- Predefined Subcategories ---
-subcategorias_listas = {
-    # "Deudas" and "Colegio o Universidad" are now in "Gastos básicos"
-    "Gastos básicos": ["Deudas", "Arriendo / Hipoteca", "Servicios públicos", "Alimentación", "Transporte", "Colegio o Universidad", "Otros Gastos Básicos"],
-    "Inversiones a largo plazo": ["Carro", "Casa", "Negocio propio", "Ahorro programado", "Otros Inversiones Largo Plazo"],
-    # "Colegio o Universidad" removed from "Educación"
-    "Educación": ["Cursos online", "Libros", "Talleres", "Certificaciones", "Otros Educación"],
-    "Invertir": ["CDTs", "Bitcoins", "Acciones", "Fondos de inversión", "Otros Inversiones"],
-    "Diversión": ["Viajes", "Restaurantes", "Cine / Entretenimiento", "Compras personales", "Otros Diversión"],
-    "Donar": ["Fundaciones", "Familia / Amigos", "Proyectos sociales", "Iglesia / Comunidad", "Otros Donar"],
-}
+with medicion.seccion("validacion"):
+    ingreso = 0 # Monthly income in cents; default value if the field is empty or invalid
+    if ingreso_str: # Only try to convert if the field is not empty
+        try:
+            # Locale-aware parsing: accepts "2500000.00", "2500000,00" and "2.500.000,00"
+            ingreso = parse_monto(ingreso_str)
+            if ingreso < 0:
+                st.error("El ingreso no puede ser un valor negativo.")
+                detener() # Stop execution if income is negative
+        except ValueError:
+            st.error("Por favor, ingresa un número válido para tu ingreso mensual.")
+            detener() # Stop execution if input is not a valid number
+
+    # Validate that income is greater than 0 before proceeding
+    if ingreso <= 0:
+        st.warning("Por favor, ingresa un ingreso mensual válido para continuar con la distribución.")
+        detener() # Stop execution if income is 0 or negative
+
+    # Month Field ("Selecciona un Mes" initially unless a month in progress was restored)
+    mes_restaurado = contexto_restaurado.get("mes")
+    mes = st.selectbox("Mes", options=mes_options, index=mes_options.index(mes_restaurado) if mes_restaurado in mes_options else 0)
+
+    # Month Validation
+    if mes == "Selecciona un Mes":
+        st.warning("Por favor, selecciona un mes válido para continuar.")
+        detener() # Stop execution of the rest of the app until a valid month is selected
+
+    # Year Field (kept with default value, common for years)
+    año = st.number_input("Año", min_value=2000, max_value=2100, value=int(contexto_restaurado.get("año", 2025)))
+
+# --- Session State Initialization ---
+# Use st.session_state to remember expenses as they are added across reruns.
+# Expenses live in a column-oriented store with running totals per jar and subcategory;
+# older sessions holding the previous dict-of-lists format are converted once.
+if not isinstance(st.session_state.get('jarron_gastos'), GastosSesion):
+    gastos_previos = st.session_state.get('jarron_gastos')
+    if not isinstance(gastos_previos, dict):
+        gastos_previos = {}
+    st.session_state.jarron_gastos = GastosSesion(subcategorias_listas)
+    for jarron_name, expenses in gastos_previos.items():
+        if jarron_name in st.session_state.jarron_gastos:
+            for expense in expenses:
+                st.session_state.jarron_gastos[jarron_name].agregar(expense["sub"], a_centavos(expense["monto"]))
+
+# Journal the month being edited whenever it changes, so it can be restored
+contexto_actual = {"ingreso": ingreso_str, "mes": mes, "año": int(año)}
+if st.session_state.get("contexto_diario") != contexto_actual:
+    diario.contexto(contexto_actual)
+    st.session_state.contexto_diario = contexto_actual
 
 # --- Jar and Subcategory Logic & Visualization (Section 2) ---
 st.header("2. Distribución de tu Ingreso")
 
-# Calculate the total amount assigned globally from session state
-total_ingreso_distribuido_gastos = sum(
-    item["monto"] for jarron_name, expenses in st.session_state.jarron_gastos.items() for item in expenses
-)
-
-for jarron, porcentaje in porcentajes.items():
-    monto_jarron = round(ingreso * porcentaje, 2)
-    st.subheader(f"✨ **{jarron}** - _{porcentaje*100:.0f}% (${monto_jarron:.2f})_")
-
-    # Calculate the currently assigned amount for this jar
-    current_assigned_for_jarron = sum(item["monto"] for item in st.session_state.jarron_gastos[jarron])
-    remaining_for_jarron = round(monto_jarron - current_assigned_for_jarron, 2)
+def rerun_jarron():
+    try:
+        st.rerun(scope="fragment") # Rerun only this jar's section
+    except StreamlitAPIException:
+        finalizar_rerun(mostrar_panel=False)
+        st.rerun() # The click arrived in a full-script run
+
+# Each jar is an isolated fragment: adding an expense reruns only that jar
+# (plus its compact totals line) instead of the whole script. Amounts are integer cents.
+@st.fragment
+def seccion_jarron(jarron, porcentaje, monto_jarron, ingreso, mes, año):
+    if not medicion.cerrada:
+        # Part of a full script run, timed by its "jarrones" section
+        contenido_jarron(jarron, porcentaje, monto_jarron, ingreso, mes, año)
+        return
+    # A fragment rerun never reaches finalizar_rerun: it gets its own measurement,
+    # log line and (with JARRONES_PERFIL, once per session) profile
+    medicion_fragmento = MedicionRerun(evento="fragmento_jarron")
+    perfilador_fragmento = None
+    if os.environ.get("JARRONES_PERFIL") and not st.session_state.get("_perfil_fragmento_capturado"):
+        perfilador_fragmento = iniciar_perfil(os.environ["JARRONES_PERFIL"])
+        st.session_state._perfil_fragmento_capturado = True
+    try:
+        with medicion_fragmento.seccion(jarron) as seccion_fragmento:
+            contenido_jarron(jarron, porcentaje, monto_jarron, ingreso, mes, año)
+            seccion_fragmento["filas"] = len(st.session_state.jarron_gastos[jarron])
+    finally:
+        if perfilador_fragmento is not None:
+            medicion_fragmento.perfil = perfilador_fragmento.detener()
+        medicion_fragmento.cerrar()
+    # Fragments cannot write to the sidebar panel; the timing goes under the jar
+    if st.session_state.get("panel_rendimiento"):
+        st.caption(f"Última actualización de este jarrón: {medicion_fragmento.total * 1000:.1f} ms")
+
+def contenido_jarron(jarron, porcentaje, monto_jarron, ingreso, mes, año):
+    st.subheader(f"✨ **{jarron}** - _{porcentaje*100:.0f}% (${formatear(monto_jarron)})_")
+
+    gastos_jarron = st.session_state.jarron_gastos[jarron]
+    # Currently assigned amount for this jar (running total, O(1))
+    current_assigned_for_jarron = gastos_jarron.total
+    remaining_for_jarron = monto_jarron - current_assigned_for_jarron
 
     # Display table of assigned expenses for this jar
-    if st.session_state.jarron_gastos[jarron]:
+    if len(gastos_jarron):
         st.markdown("##### Gastos Asignados en esta Sesión:")
-        df_jarron_actual_display = pd.DataFrame(st.session_state.jarron_gastos[jarron])
-        df_jarron_actual_display.columns = ["Subcategoría", "Monto Asignado"]
-        st.dataframe(df_jarron_actual_display, hide_index=True, use_container_width=True)
+        st.dataframe(gastos_jarron.vista(), hide_index=True, width="stretch")
+
+        # Edit or delete a single expense
+        with st.expander("✏️ Editar o eliminar un gasto"):
+            idx = st.selectbox(
+                "Gasto",
+                options=range(len(gastos_jarron)),
+                format_func=lambda i: f"#{i + 1} · {gastos_jarron.subcategoria(i)} · ${formatear(gastos_jarron.monto(i))}",
+                key=f"edit_select_{jarron}_{mes}_{año}"
+            )
+            nuevo_monto_str = st.text_input(
+                "Nuevo monto",
+                value="",
+                placeholder=f"Actual: ${formatear(gastos_jarron.monto(idx))}",
+                key=f"edit_amount_{jarron}_{mes}_{año}"
+            )
+            col_edit, col_delete = st.columns(2)
+            with col_edit:
+                if st.button("💾 Guardar cambio", key=f"edit_{jarron}_{mes}_{año}"):
+                    try:
+                        nuevo_monto = parse_monto(nuevo_monto_str)
+                        if nuevo_monto <= 0:
+                            st.error("El monto debe ser un valor positivo.")
+                        elif excedente(current_assigned_for_jarron - gastos_jarron.monto(idx), nuevo_monto, monto_jarron) > 0:
+                            st.error("¡Exceso! Con este cambio te excederías del límite del jarrón.")
+                        else:
+                            diario.editar(jarron, gastos_jarron.id(idx), centavos=nuevo_monto) # Journaled before it is applied
+                            gastos_jarron.editar(idx, monto=nuevo_monto)
+                            rerun_jarron()
+                    except ValueError:
+                        st.error("Por favor, ingresa un monto numérico válido.")
+            with col_delete:
+                if st.button("🗑️ Eliminar", key=f"delete_{jarron}_{mes}_{año}"):
+                    diario.eliminar(jarron, gastos_jarron.id(idx))
+                    gastos_jarron.eliminar(idx)
+                    rerun_jarron()
     
     # Remaining balance message
     if remaining_for_jarron < 0:
-        st.error(f"⚠️ **Te has excedido en '{jarron}':** ${-remaining_for_jarron:.2f} sobre el límite del jarrón.")
+        st.error(f"⚠️ **Te has excedido en '{jarron}':** ${formatear(-remaining_for_jarron)} sobre el límite del jarrón.")
     elif remaining_for_jarron == 0:
         st.success(f"✅ **'{jarron}'** asignado completamente. ($0.00 restante)")
     else:
-        st.info(f"💡 **Disponible en '{jarron}':** ${remaining_for_jarron:.2f}")
+        st.info(f"💡 **Disponible en '{jarron}':** ${formatear(remaining_for_jarron)}")
 
     st.markdown("###### Añadir nuevo gasto:")
     col1, col2, col3 = st.columns([0.4, 0.3, 0.2])
@@ -138,12 +285,12 @@ for jarron, porcentaje in porcentajes.items():
         amount_str = st.text_input(
             f"Monto para {selected_sub}",
             value="",
-            placeholder=f"Max: ${remaining_for_jarron:.2f}",
+            placeholder=f"Max: ${formatear(remaining_for_jarron)}",
             key=f"amount_{jarron}_{selected_sub}_{mes}_{año}" # Unique key
         )
     with col3:
         st.markdown("<br>", unsafe_allow_html=True) # Space to align button
-        add_button_key = f"add_{jarron}_{mes}_{año}_{len(st.session_state.jarron_gastos[jarron])}" # Unique key
+        add_button_key = f"add_{jarron}_{mes}_{año}_{len(gastos_jarron)}" # Unique key
         if st.button("➕ Añadir", key=add_button_key):
             if selected_sub == "-- Selecciona --":
                 st.error("Por favor, selecciona una subcategoría válida.")
@@ -151,275 +298,270 @@ for jarron, porcentaje in porcentajes.items():
                 st.error("Por favor, ingresa un monto para el gasto.")
             else:
                 try:
-                    amount = float(amount_str.replace(",", ".")) # Replace comma with dot
+                    amount = parse_monto(amount_str) # Integer cents, exact comparison below
                     if amount <= 0:
                         st.error("El monto debe ser un valor positivo.")
-                    elif current_assigned_for_jarron + amount > monto_jarron + 0.001: # Small float tolerance
-                        st.error(f"¡Exceso! Este gasto haría que te excedas en ${round(current_assigned_for_jarron + amount - monto_jarron, 2):.2f}. Reduce el valor.")
+                    elif (exceso := excedente(current_assigned_for_jarron, amount, monto_jarron)) > 0:
+                        st.error(f"¡Exceso! Este gasto haría que te excedas en ${formatear(exceso)}. Reduce el valor.")
                     else:
-                        # Add expense to session state
-                        st.session_state.jarron_gastos[jarron].append({
-                            "sub": selected_sub,
-                            "monto": amount
-                        })
-                        st.rerun() # Rerun to update the interface with the new expense
+                        # Add expense to session state (an O(1) journal append is the autosave)
+                        id_gasto = diario.agregar(jarron, selected_sub, amount)
+                        gastos_jarron.agregar(selected_sub, amount, id_gasto)
+                        rerun_jarron()
                 except ValueError:
                     st.error("Por favor, ingresa un monto numérico válido.")
 
-    st.markdown("---") # Separator between jars
-
-# --- Total Assignment Summary ---
-st.subheader("Resumen de Asignación Total")
-total_no_asignado_global = round(ingreso - total_ingreso_distribuido_gastos, 2)
-if total_no_asignado_global > 0:
-    st.warning(f"**Atención:** ${total_no_asignado_global:.2f} de tu ingreso total (${ingreso:.2f}) no ha sido asignado a ninguna subcategoría.")
-elif total_no_asignado_global < 0:
-     st.error(f"**¡Alerta de Exceso!** Te has excedido en ${-total_no_asignado_global:.2f} sobre tu ingreso total.")
-else:
-    st.success(f"**¡Felicidades!** Has asignado el 100% de tu ingreso (${ingreso:.2f}) a tus jarrones y subcategorías.")
+    # Compact global totals, refreshed together with this jar
+    total_asignado = st.session_state.jarron_gastos.total
+    st.caption(f"Total asignado: ${formatear(total_asignado)} de ${formatear(ingreso)} · Sin asignar: ${formatear(ingreso - total_asignado)}")
+
+# Exact split of the income: leftover cents from rounding go to JARRON_RESIDUO
+montos_jarrones = repartir_ingreso(ingreso)
+
+# --- Bank Statement Import ---
+# A CSV/OFX export is read in blocks and categorized with the keyword index plus
+# this user's learned corrections. After review, changed categories are learned
+# and the rows go into the jars in one bulk insert per jar; the limit check runs
+# over the whole batch at once (in order, per jar).
+SEPARADOR_CATEGORIA = " › "
+categorias_importacion = [
+    f"{jarron_nombre}{SEPARADOR_CATEGORIA}{sub}"
+    for jarron_nombre, subs in subcategorias_listas.items() for sub in subs
+]
+resultado_importacion = st.session_state.pop("resultado_importacion", None)
+with st.expander("📥 Importar extracto bancario (CSV/OFX)", expanded=resultado_importacion is not None):
+    if resultado_importacion is not None:
+        admitidos, rechazados = resultado_importacion
+        st.success(f"✅ {admitidos} gastos añadidos a tus jarrones.")
+        if len(rechazados):
+            st.warning(f"{len(rechazados)} gastos no se añadieron porque excedían el límite de su jarrón:")
+            st.dataframe(rechazados, hide_index=True, width="stretch")
+    extracto = st.file_uploader(
+        "Extracto del banco",
+        type=["csv", "txt", "ofx", "qfx"],
+        key=f"extracto_{st.session_state.get('extractos_importados', 0)}"
+    )
+    if extracto is not None:
+        with medicion.seccion("importacion") as seccion_actual:
+            categorizador = Categorizador(ruta_categorias_aprendidas(usuario))
+            # Read and categorize once per uploaded file, not on every rerun
+            if st.session_state.get("extracto_id") != extracto.file_id:
+                try:
+                    df_extracto = categorizar_extracto(extracto, extracto.name, categorizador)
+                except ValueError as e:
+                    st.error(f"No se pudo leer el extracto: {e}")
+                    df_extracto = None
+                st.session_state.extracto_id = extracto.file_id
+                st.session_state.extracto_df = df_extracto
+            df_extracto = st.session_state.extracto_df
+            if df_extracto is not None and df_extracto.empty:
+                st.info("El extracto no contiene gastos (débitos).")
+            elif df_extracto is not None:
+                seccion_actual["filas"] = len(df_extracto)
+                sugeridas = df_extracto["Jarrón"] + SEPARADOR_CATEGORIA + df_extracto["Subcategoría"]
+                revision = st.data_editor(
+                    df_extracto[["Fecha", "Descripción"]].assign(
+                        **{
+                            "Monto ($)": a_pesos(df_extracto["Centavos"]),
+                            "Categoría": sugeridas,
+                            "Origen": df_extracto["Origen"],
+                            "Importar": True,
+                        }
+                    ),
+                    column_config={
+                        "Categoría": st.column_config.SelectboxColumn(options=categorias_importacion, required=True),
+                        "Importar": st.column_config.CheckboxColumn(),
+                    },
+                    disabled=["Fecha", "Descripción", "Monto ($)", "Origen"],
+                    hide_index=True,
+                    width="stretch",
+                    key=f"revision_{st.session_state.extracto_id}"
+                )
+                if st.button("➕ Añadir gastos del extracto", key="importar_extracto"):
+                    partes = revision["Categoría"].str.split(SEPARADOR_CATEGORIA, n=1, regex=False)
+                    jarrones_lote, subs_lote = partes.str[0], partes.str[1]
+                    # Corrections made in the table are learned for next time
+                    corregidas = revision["Categoría"] != sugeridas
+                    categorizador.aprender(zip(
+                        revision.loc[corregidas, "Descripción"], jarrones_lote[corregidas], subs_lote[corregidas]
+                    ))
+                    seleccion = revision["Importar"].to_numpy(dtype=bool)
+                    centavos_lote = df_extracto["Centavos"].to_numpy()[seleccion]
+                    jarrones_sel = jarrones_lote.to_numpy()[seleccion]
+                    subs_sel = subs_lote.to_numpy()[seleccion]
+                    gastos_sesion = st.session_state.jarron_gastos
+                    admitido = admitir_en_orden(
+                        jarrones_sel,
+                        centavos_lote,
+                        {jarron_nombre: gastos_sesion[jarron_nombre].total for jarron_nombre in porcentajes},
+                        montos_jarrones
+                    )
+                    lote = (jarrones_sel[admitido], subs_sel[admitido], centavos_lote[admitido])
+                    ids_lote = diario.agregar_lote(*lote)
+                    gastos_sesion.agregar_lote(*lote, ids_lote)
+                    st.session_state.resultado_importacion = (
+                        int(admitido.sum()),
+                        revision[seleccion][~admitido][["Fecha", "Descripción", "Monto ($)", "Categoría"]]
+                    )
+                    # A fresh uploader key clears the processed file
+                    st.session_state.extractos_importados = st.session_state.get("extractos_importados", 0) + 1
+                    del st.session_state["extracto_id"], st.session_state["extracto_df"]
+                    finalizar_rerun(mostrar_panel=False)
+                    st.rerun()
+
+with medicion.seccion("jarrones") as seccion_actual:
+    for jarron, porcentaje in porcentajes.items():
+        seccion_jarron(jarron, porcentaje, montos_jarrones[jarron], ingreso, mes, año)
+        st.markdown("---") # Separator between jars
+    seccion_actual["filas"] = sum(len(gastos) for gastos in st.session_state.jarron_gastos.jarrones.values())
+
+with medicion.seccion("totales"):
+    # Total amount assigned globally (sum of the per-jar running totals)
+    total_ingreso_distribuido_gastos = st.session_state.jarron_gastos.total
+
+    # --- Total Assignment Summary ---
+    st.subheader("Resumen de Asignación Total")
+    total_no_asignado_global = ingreso - total_ingreso_distribuido_gastos
+    if total_no_asignado_global > 0:
+        st.warning(f"**Atención:** ${formatear(total_no_asignado_global)} de tu ingreso total (${formatear(ingreso)}) no ha sido asignado a ninguna subcategoría.")
+    elif total_no_asignado_global < 0:
+         st.error(f"**¡Alerta de Exceso!** Te has excedido en ${formatear(-total_no_asignado_global)} sobre tu ingreso total.")
+    else:
+        st.success(f"**¡Felicidades!** Has asignado el 100% de tu ingreso (${formatear(ingreso)}) a tus jarrones y subcategorías.")
 
 
 # --- Save and Show History Button ---
-# Reconstruct the 'resultados' DataFrame from session state to save
-resultados_para_guardar = []
-
-# --- IMPORTANT: Add the current month's total income as a special entry ---
-resultados_para_guardar.append({
-    "Año": año,
-    "Mes": mes,
-    "Jarrón": "Ingreso Mensual", # Special Jarrón to represent total income for the month
-    "Subcategoría": "Total Ingreso",
-    "Monto asignado": ingreso # The total income for this current month
-})
-
-# Add all the expenses from session state
-for jarron_name, expenses in st.session_state.jarron_gastos.items():
-    for expense in expenses:
-        resultados_para_guardar.append({
-            "Año": año,
-            "Mes": mes,
-            "Jarrón": jarron_name,
-            "Subcategoría": expense["sub"],
-            "Monto asignado": expense["monto"]
-        })
-
 if st.button("💾 Guardar y Mostrar Historial", key="save_button"):
+    # Income entry ("Ingreso Mensual") followed by every expense of the session
+    resultados_para_guardar = filas_historial(ingreso, st.session_state.jarron_gastos.filas())
+
     # Check if there are any actual expenses (besides the income entry)
     if len(resultados_para_guardar) <= 1 and ingreso == 0: # If only income entry exists and income is 0
         st.warning("No hay datos significativos (ingreso o gastos) para guardar.")
     else:
-        df_resultado_actual = pd.DataFrame(resultados_para_guardar)
-        
-        # Save history to a CSV file
-        archivo = "historial_desglose_jarrones.csv"
-        df_final = pd.DataFrame()
-
-        if os.path.exists(archivo):
-            try:
-                df_existente = pd.read_csv(archivo)
-                # Filter out previous income entries for the current month/year to avoid duplication
-                df_existente_filtered = df_existente[
-                    ~((df_existente['Año'] == año) & 
-                      (df_existente['Mes'] == mes) & 
-                      (df_existente['Jarrón'] == "Ingreso Mensual"))
-                ]
-                # Filter out previous expense entries for the current month/year to avoid duplication
-                # This ensures that if a user re-saves for the same month, it updates rather than duplicates
-                df_existente_filtered = df_existente_filtered[
-                    ~((df_existente_filtered['Año'] == año) & 
-                      (df_existente_filtered['Mes'] == mes) & 
-                      (df_existente_filtered['Jarrón'] != "Ingreso Mensual"))
-                ]
-                
-                df_final = pd.concat([df_existente_filtered, df_resultado_actual], ignore_index=True)
-            except pd.errors.EmptyDataError:
-                st.warning("El archivo de historial está vacío. Se creará uno nuevo.")
-                df_final = df_resultado_actual
-            except Exception as e:
-                st.error(f"Error al leer el historial existente: {e}. Se intentará guardar solo los datos actuales.")
-                df_final = df_resultado_actual
-        else:
-            df_final = df_resultado_actual
-        
-        df_final.to_csv(archivo, index=False)
+        # Save history: only the rows of the current (Año, Mes) are replaced
+        historial = obtener_historial(usuario)
+        with medicion.seccion("guardar", filas=len(resultados_para_guardar)):
+            historial.guardar_mes(año, mes, resultados_para_guardar)
+            diario.guardado() # Later sessions restore the month without reporting it as unsaved
+        st.session_state.pop("cambios_sin_guardar", None)
         st.success("✅ ¡Datos registrados y historial actualizado!")
         
         # --- NEW SECTIONS: MONTHLY AND ANNUAL ACCUMULATIONS (Simplified) ---
         st.subheader("📈 Acumulados Históricos")
         
-        if not df_final.empty:
-            # Monthly Accumulation - Simplified
-            st.markdown("### Resumen Mensual")
-            # First, map month names to numbers for correct sorting
-            meses_map = {
-                "Enero": 1, "Febrero": 2, "Marzo": 3, "Abril": 4, "Mayo": 5, "Junio": 6,
-                "Julio": 7, "Agosto": 8, "Septiembre": 9, "Octubre": 10, "Noviembre": 11, "Diciembre": 12
-            }
-            # Ensure 'Mes_Num' is created and is a numeric type for sorting
-            df_final['Mes_Num'] = df_final['Mes'].map(meses_map).fillna(0).astype(int)
-            
-            # Group by Year, Mes_Num, Mes, and Jarrón, then sum Monto asignado
-            df_monthly_summary = df_final.groupby(['Año', 'Mes_Num', 'Mes', 'Jarrón'])['Monto asignado'].sum().reset_index()
-            
-            # Pivot the table to have Jarrón names as columns
-            df_monthly_pivot = df_monthly_summary.pivot_table(
-                index=['Año', 'Mes_Num', 'Mes'], # Mes_Num is part of the index for sorting
-                columns='Jarrón', 
-                values='Monto asignado', 
-                fill_value=0
-            ).reset_index()
-
-            # Ensure all expected jar columns exist before reordering
-            all_jars_columns = ["Ingreso Mensual"] + list(porcentajes.keys())
-            for col in all_jars_columns:
-                if col not in df_monthly_pivot.columns:
-                    df_monthly_pivot[col] = 0.0 # Add missing jar columns with 0
-
-            # Calculate total spent for display (excluding Ingreso Mensual)
-            gastos_cols_monthly = [col for col in porcentajes.keys() if col in df_monthly_pivot.columns]
-            df_monthly_pivot['Total Gastado del Mes'] = df_monthly_pivot[gastos_cols_monthly].sum(axis=1)
-
-            # Calculate remaining balance for the month
-            df_monthly_pivot['Saldo Mensual'] = df_monthly_pivot['Ingreso Mensual'] - df_monthly_pivot['Total Gastado del Mes']
-
-            # Sort df_monthly_pivot FIRST by Year and Mes_Num, then select simplified columns
-            df_monthly_pivot_sorted = df_monthly_pivot.sort_values(by=['Año', 'Mes_Num'])
-
-            # Now create the simplified DataFrame from the *sorted* pivot table
-            df_monthly_simplified = df_monthly_pivot_sorted[['Año', 'Mes', 'Ingreso Mensual', 'Total Gastado del Mes', 'Saldo Mensual']]
-            
-            st.dataframe(df_monthly_simplified, use_container_width=True) # No need to sort again here
-            
-            # Annual Accumulation - Simplified
-            st.markdown("### Resumen Anual")
-            df_annual_summary = df_final.groupby(['Año', 'Jarrón'])['Monto asignado'].sum().reset_index()
-            df_annual_pivot = df_annual_summary.pivot_table(
-                index='Año', 
-                columns='Jarrón', 
-                values='Monto asignado', 
-                fill_value=0
-            ).reset_index()
-
-            # Reorder columns and calculate totals/balance for annual summary
-            for col in all_jars_columns: # Reuse all_jars_columns from monthly for consistency
-                if col not in df_annual_pivot.columns:
-                    df_annual_pivot[col] = 0.0 # Add missing jar columns with 0
-
-            df_annual_pivot['Total Gastado del Año'] = df_annual_pivot[[col for col in porcentajes.keys() if col in df_annual_pivot.columns]].sum(axis=1)
-            # The 'Ingreso Mensual' column in df_annual_pivot already represents the sum for the year because
-            # it was grouped by 'Año' and 'Jarrón' (where Ingreso Mensual is a Jarrón category)
-            df_annual_pivot['Ingreso Total Anual'] = df_annual_pivot['Ingreso Mensual'] 
-            df_annual_pivot['Saldo Anual'] = df_annual_pivot['Ingreso Total Anual'] - df_annual_pivot['Total Gastado del Año']
-
-            df_annual_simplified = df_annual_pivot[['Año', 'Ingreso Total Anual', 'Total Gastado del Año', 'Saldo Anual']]
-            st.dataframe(df_annual_simplified.sort_values(by='Año'), use_container_width=True)
+        if not historial.esta_vacio():
+            # Jar totals per month/year are maintained by the store on each save
+            with medicion.seccion("resumenes") as seccion_actual:
+                df_monthly_summary, df_annual_summary = cargar_resumenes(historial)
+
+                # Monthly Accumulation - Simplified
+                st.markdown("### Resumen Mensual")
+                df_monthly_simplified = resumen_mensual_simplificado(df_monthly_summary, porcentajes.keys())
+                st.dataframe(df_monthly_simplified, width="stretch")
             
-            # Clean up temporary columns from df_final (Mes_Num is used before this point)
-            if 'Mes_Num' in df_final.columns: # Check if column exists before dropping
-                df_final.drop(columns=['Mes_Num'], errors='ignore', inplace=True) 
+                # Annual Accumulation - Simplified
+                st.markdown("### Resumen Anual")
+                df_annual_simplified = resumen_anual_simplificado(df_annual_summary, porcentajes.keys())
+                st.dataframe(df_annual_simplified, width="stretch")
+                seccion_actual["filas"] = len(df_monthly_summary) + len(df_annual_summary)
 
         else:
             st.info("No hay datos en el historial para mostrar acumulados.")
 
+        # --- Charts (from current session) ---
+        st.subheader("📊 Distribución por Jarrón y Subcategorías (de la sesión actual)")
+        with medicion.seccion("graficos") as seccion_actual:
+            datos_grafico = datos_desde_sesion(st.session_state.jarron_gastos)
+            seccion_actual["filas"] = sum(len(subs) for _, subs in datos_grafico)
+            # Ensure not to try graphing if no data is assigned (excluding the income entry)
+            if not totales_por_jarron(datos_grafico):
+                st.info("No hay montos asignados en esta sesión para graficar.")
+            elif graficos_nativos:
+                # Streamlit's own vector charts: no matplotlib import or rasterizing
+                import pandas as pd
+                st.bar_chart(
+                    pd.DataFrame(
+                        [(jarron_nombre, a_pesos(total)) for jarron_nombre, total in totales_por_jarron(datos_grafico)],
+                        columns=["Jarrón", "Monto ($)"]
+                    ).set_index("Jarrón")
+                )
+                for jarron_nombre, subs in datos_grafico:
+                    if subs:
+                        st.markdown(f"#### 🔍 **{jarron_nombre}**")
+                        st.bar_chart(
+                            pd.DataFrame(
+                                [(sub, a_pesos(total)) for sub, total in subs],
+                                columns=["Subcategorías", "Monto ($)"]
+                            ).set_index("Subcategorías")
+                        )
+            else:
+                # One multi-panel figure, cached by the plotted data
+                st.image(renderizar_figura(datos_grafico), width="stretch")
 
-        # --- Download Buttons ---
-        st.subheader("Opciones de Descarga")
-
-        # Download as CSV
-        csv_download = df_final.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            "📥 Descargar historial (CSV)",
-            csv_download,
-            "jarrones_historial.csv",
-            "text/csv",
-            key="download_csv"
-        )
-        
-        # Download as Excel (New functionality)
-        excel_buffer = io.BytesIO()
-        # Create a Pandas Excel writer using XlsxWriter as the engine.
-        # Ensure 'Monto asignado' is numeric for Excel formatting if needed
-        # Convert df_final 'Monto asignado' to numeric, handling errors
-        df_final['Monto asignado'] = pd.to_numeric(df_final['Monto asignado'], errors='coerce').fillna(0)
-        
-        with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
-            df_final.to_excel(writer, sheet_name='Historial Completo', index=False)
-            
-            # Optionally add monthly and annual summaries to different sheets
-            if not df_monthly_simplified.empty:
-                # Convert 'Ingreso Mensual', 'Total Gastado del Mes', 'Saldo Mensual' to numeric
-                for col in ['Ingreso Mensual', 'Total Gastado del Mes', 'Saldo Mensual']:
-                    if col in df_monthly_simplified.columns:
-                        df_monthly_simplified[col] = pd.to_numeric(df_monthly_simplified[col], errors='coerce').fillna(0)
-                df_monthly_simplified.to_excel(writer, sheet_name='Resumen Mensual', index=False)
-            if not df_annual_simplified.empty:
-                # Convert 'Ingreso Total Anual', 'Total Gastado del Año', 'Saldo Anual' to numeric
-                for col in ['Ingreso Total Anual', 'Total Gastado del Año', 'Saldo Anual']:
-                    if col in df_annual_simplified.columns:
-                        df_annual_simplified[col] = pd.to_numeric(df_annual_simplified[col], errors='coerce').fillna(0)
-                df_annual_simplified.to_excel(writer, sheet_name='Resumen Anual', index=False)
-
-        excel_buffer.seek(0) # Rewind the buffer
-        st.download_button(
-            "📊 Descargar historial (Excel)",
-            excel_buffer.getvalue(),
-            "jarrones_historial.xlsx",
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key="download_excel"
-        )
-
-        # --- General Pie Chart (from current session) ---
-        st.subheader("📊 Distribución General por Jarrón (de la sesión actual)")
-        # Ensure not to try graphing if no data is assigned (excluding the income entry)
-        df_current_expenses = df_resultado_actual[df_resultado_actual['Jarrón'] != 'Ingreso Mensual']
-        if not df_current_expenses["Monto asignado"].sum() == 0:
-            df_total_jarrones = df_current_expenses.groupby("Jarrón")["Monto asignado"].sum()
-            fig1, ax1 = plt.subplots(figsize=(8, 8))
-            ax1.pie(df_total_jarrones, labels=df_total_jarrones.index, autopct="%1.1f%%", startangle=90, pctdistance=0.85)
-            ax1.axis("equal") # Equal aspect ratio ensures that pie is drawn as a circle.
-            st.pyplot(fig1)
-            plt.close(fig1) # Close the figure to free up memory
+# --- Download Buttons ---
+# Files are generated only when a download button is clicked (callable data),
+# streamed from the store and cached per history version and year range.
+# Generation happens outside the script run and is logged as its own event.
+st.markdown("---")
+st.subheader("Opciones de Descarga")
+with medicion.seccion("exportaciones"):
+    historial = obtener_historial(usuario)
+    años_historial = historial.años()
+    if años_historial:
+        if len(años_historial) > 1:
+            año_desde, año_hasta = st.select_slider(
+                "Años a exportar",
+                options=años_historial,
+                value=(años_historial[0], años_historial[-1]),
+                key="export_years"
+            )
         else:
-            st.info("No hay montos asignados en esta sesión para el gráfico general.")
-
-        # --- Bar Charts for Subcategories (from current session) ---
-        st.subheader("📊 Detalle por Subcategorías de Cada Jarrón (de la sesión actual)")
-        for jarron_nombre in df_current_expenses["Jarrón"].unique(): # Iterate over expense jars only
-            df_j = df_current_expenses[df_current_expenses["Jarrón"] == jarron_nombre]
-            
-            # Filter subcategories with amount > 0 to graph only assigned ones
-            df_j_filtrado = df_j[df_j["Monto asignado"] > 0] 
-
-            if not df_j_filtrado.empty:
-                st.markdown(f"#### 🔍 **{jarron_nombre}**")
-                fig2, ax2 = plt.subplots(figsize=(10, 6))
-                ax2.bar(df_j_filtrado["Subcategoría"], df_j_filtrado["Monto asignado"], color="skyblue")
-                ax2.set_ylabel("Monto ($)")
-                ax2.set_xlabel("Subcategorías")
-                ax2.set_title(f"Distribución en '{jarron_nombre}'")
-                plt.xticks(rotation=45, ha='right') # Rotate labels for better readability
-                plt.tight_layout() # Adjust layout so labels are not cut off
-                st.pyplot(fig2)
-                plt.close(fig2) # Close the figure to free up memory
-            else:
-                st.info(f"No hay montos asignados en '{jarron_nombre}' para graficar en esta sesión.")
+            año_desde = año_hasta = años_historial[0]
+        sufijo_archivo = f"{año_desde}" if año_desde == año_hasta else f"{año_desde}_{año_hasta}"
+        jarrones_export = list(porcentajes.keys())
+
+        col_csv, col_excel = st.columns(2)
+        with col_csv:
+            st.download_button(
+                "📥 Descargar historial (CSV)",
+                lambda: cronometrado("exportar_csv", exportar, historial, "csv", jarrones_export, año_desde, año_hasta),
+                f"jarrones_historial_{sufijo_archivo}.csv",
+                "text/csv",
+                key="download_csv"
+            )
+        with col_excel:
+            st.download_button(
+                "📊 Descargar historial (Excel)",
+                lambda: cronometrado("exportar_excel", exportar, historial, "xlsx", jarrones_export, año_desde, año_hasta),
+                f"jarrones_historial_{sufijo_archivo}.xlsx",
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key="download_excel"
+            )
+    else:
+        st.info("Aún no hay historial para descargar.")
 
 # --- Button to clear all history ---
-st.markdown("---")
+# Only the current user's partition is deleted
 st.subheader("Gestión del Historial")
 if st.button("🗑️ Borrar TODO el Historial", key="clear_history_button"):
-    archivo_historial = "historial_desglose_jarrones.csv"
-    if os.path.exists(archivo_historial):
+    historial = obtener_historial(usuario)
+    if not historial.esta_vacio():
         try:
-            os.remove(archivo_historial)
-            st.success("✅ ¡Historial borrado completamente! La aplicación se reiniciará para reflejar los cambios.")
+            with medicion.seccion("borrar"):
+                historial.borrar_todo()
+                diario.descartar() # Journal records after the draft would otherwise bring the month back
+            st.success("✅ ¡Tu historial fue borrado completamente! La aplicación se reiniciará para reflejar los cambios.")
             
             # Optionally clear session state to reset the app completely
             for key in st.session_state.keys():
                 del st.session_state[key]
             
+            finalizar_rerun(mostrar_panel=False)
             st.rerun() # Rerun the app to show a clean state
         except Exception as e:
             st.error(f"❌ Error al borrar el historial: {e}")
     else:
-        st.info("No hay historial para borrar. El archivo 'historial_desglose_jarrones.csv' no existe.")
+        st.info("No hay historial para borrar.")
+
+finalizar_rerun()
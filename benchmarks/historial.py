@@ -0,0 +1,286 @@
+"""Save, summary, export and chart timings on synthetic histories.
+
+Generates histories with the schema of historial_desglose_jarrones.csv (income
+row plus line items for every jar and month, using the real
+``subcategorias_listas``) and times each stage of the app against them,
+reporting wall time and peak memory per stage. With ``--baseline`` it compares
+against a previous JSON report and exits with status 1 when any stage gets
+slower than ``--tolerancia``.
+
+    python benchmarks/historial.py --tamaños 10000,1000000 --salida benchmarks/resultados/historial.json
+    python benchmarks/historial.py --csv sintetico.csv --tamaños 10000
+    python benchmarks/historial.py --baseline benchmarks/resultados/historial.json
+
+Wall time is measured on a plain run; peak memory on a second run under
+tracemalloc (Python and NumPy allocations only; SQLite's own cache is not
+included), so tracing overhead does not inflate the timings.
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np  # noqa: E402
+
+from config_jarrones import meses_map, porcentajes, subcategorias_listas  # noqa: E402
+from exportaciones import generar_csv, generar_excel  # noqa: E402
+from graficos import renderizar_figura  # noqa: E402
+from historial_columnar import cargar_columnas, escribir_columnar, resumir_columnar  # noqa: E402
+from historial_store import COLUMNAS_HISTORIAL, SQLiteHistorialStore  # noqa: E402
+from motor_jarrones import filas_historial, repartir_ingresos  # noqa: E402
+from resumenes import resumen_anual_simplificado, resumen_mensual_simplificado  # noqa: E402
+from tendencias import analizar  # noqa: E402
+
+TAMAÑOS = [10_000, 1_000_000, 10_000_000]
+AÑO_INICIAL = 2000
+
+
+class HistorialSintetico:
+    """Deterministic synthetic history: `años` x `meses` months, `items` expenses per jar.
+
+    Monthly incomes are drawn between 2M and 10M pesos; each jar spends a random
+    40-100% of its limit spread over `items` line items with subcategories taken
+    from `subcategorias_listas`. All amounts are integer cents.
+    """
+
+    def __init__(self, años=10, meses=12, items=5, semilla=0):
+        self.años = años
+        self.meses = list(meses_map)[:meses]
+        self.items = items
+        self.semilla = semilla
+
+    @classmethod
+    def para_filas(cls, filas, años=10, meses=12, semilla=0):
+        """The history closest to `filas` rows with the given number of months."""
+        por_mes = filas / (años * meses)
+        items = max(1, round((por_mes - 1) / len(porcentajes)))
+        return cls(años, meses, items, semilla)
+
+    @property
+    def filas(self):
+        return self.años * len(self.meses) * (1 + len(porcentajes) * self.items)
+
+    def meses_generados(self):
+        """Yield (año, mes, filas) with the same rows app6.py passes to guardar_mes."""
+        rng = np.random.default_rng(self.semilla)
+        jarrones = list(porcentajes)
+        for año in range(AÑO_INICIAL, AÑO_INICIAL + self.años):
+            ingresos = rng.integers(200_000_000, 1_000_000_000, size=len(self.meses))
+            limites = repartir_ingresos(ingresos)
+            for mes, ingreso, limites_mes in zip(self.meses, ingresos, limites):
+                gastos = []
+                for jarron, limite in zip(jarrones, limites_mes):
+                    pesos = rng.random(self.items)
+                    gastado = int(limite * rng.uniform(0.4, 1.0))
+                    montos = (pesos / pesos.sum() * gastado).astype(np.int64)
+                    subcategorias = subcategorias_listas[jarron]
+                    elegidas = rng.integers(0, len(subcategorias), size=self.items)
+                    gastos.extend(
+                        (jarron, subcategorias[i], int(monto)) for i, monto in zip(elegidas, montos)
+                    )
+                yield año, mes, filas_historial(int(ingreso), gastos)
+
+    def escribir_csv(self, ruta):
+        """Write the history as a legacy CSV (Monto asignado in pesos)."""
+        with open(ruta, "w", newline="", encoding="utf-8") as f:
+            escritor = csv.writer(f, lineterminator="\n")
+            escritor.writerow(COLUMNAS_HISTORIAL)
+            for año, mes, filas in self.meses_generados():
+                escritor.writerows(
+                    (año, mes, fila["Jarrón"], fila["Subcategoría"], fila["Centavos"] / 100) for fila in filas
+                )
+
+
+def _medir(funcion, memoria=True):
+    inicio = time.perf_counter()
+    funcion()
+    resultado = {"segundos": round(time.perf_counter() - inicio, 4)}
+    if memoria:
+        tracemalloc.start()
+        try:
+            funcion()
+            resultado["pico_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    return resultado
+
+
+def _medir_guardado(historial, sintetico, memoria=True):
+    """Like _medir for saving the whole history; returns (medida, last month).
+
+    Months are generated lazily, one at a time (as the app holds one month's
+    rows), so the history is never materialized. Only the guardar_mes calls
+    are counted in "segundos"; generation is reported in "generacion_segundos".
+    The memory peak includes the month being generated.
+    """
+    def guardar():
+        historial.borrar_todo()
+        guardado = generacion = 0.0
+        mes_final = None
+        inicio = time.perf_counter()
+        for año, mes, filas in sintetico.meses_generados():
+            generado = time.perf_counter()
+            generacion += generado - inicio
+            historial.guardar_mes(año, mes, filas)
+            inicio = time.perf_counter()
+            guardado += inicio - generado
+            mes_final = (año, mes, filas)
+        return guardado, generacion, mes_final
+
+    guardado, generacion, mes_final = guardar()
+    resultado = {"segundos": round(guardado, 4), "generacion_segundos": round(generacion, 4)}
+    if memoria:
+        tracemalloc.start()
+        try:
+            guardar()
+            resultado["pico_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    return resultado, mes_final
+
+
+def _datos_grafico(filas):
+    totales = {}
+    for fila in filas[1:]:
+        clave = (fila["Jarrón"], fila["Subcategoría"])
+        totales[clave] = totales.get(clave, 0) + fila["Centavos"]
+    return tuple(
+        (jarron, tuple((sub, total) for (j, sub), total in totales.items() if j == jarron))
+        for jarron in porcentajes
+    )
+
+
+def medir_tamaño(sintetico, memoria=True):
+    """Stage timings for one synthetic history: {'filas', 'items_por_jarron', 'etapas'}."""
+    jarrones = list(porcentajes)
+    etapas = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        historial = SQLiteHistorialStore(os.path.join(directorio, "bench.db"), csv_legado=None)
+        try:
+            etapas["guardar"], (año, mes, filas_mes) = _medir_guardado(historial, sintetico, memoria)
+            # Saving one month into an existing history, as the app's save button does
+            etapas["guardar_mes"] = _medir(lambda: historial.guardar_mes(año, mes, filas_mes), memoria)
+            etapas["resumenes"] = _medir(lambda: (
+                resumen_mensual_simplificado(historial.resumen_mensual(), jarrones),
+                resumen_anual_simplificado(historial.resumen_anual(), jarrones),
+            ), memoria)
+            etapas["reconstruir_resumenes"] = _medir(historial.reconstruir_resumenes, memoria)
+            etapas["snapshot_columnar"] = _medir(lambda: escribir_columnar(historial), memoria)
+            etapas["cargar_columnar"] = _medir(lambda: cargar_columnas(historial), memoria)
+            etapas["resumir_columnar"] = _medir(
+                lambda: resumir_columnar(historial, ["Año", "Jarrón", "Subcategoría"]), memoria
+            )
+            etapas["tendencias"] = _medir(
+                lambda: analizar(resumir_columnar(historial, ["Año", "Mes_Num", "Jarrón", "Subcategoría"])), memoria
+            )
+            etapas["exportar_csv"] = _medir(lambda: generar_csv(historial), memoria)
+            # Histories past LIMITE_FILAS_EXCEL rows continue on extra sheets
+            etapas["exportar_excel"] = _medir(lambda: generar_excel(historial, jarrones), memoria)
+            datos = _datos_grafico(filas_mes)
+
+            def graficar():
+                renderizar_figura.cache_clear()
+                renderizar_figura(datos)
+
+            etapas["graficos"] = _medir(graficar, memoria)
+        finally:
+            historial.cerrar()
+    return {
+        "filas": sintetico.filas,
+        "años": sintetico.años,
+        "meses": len(sintetico.meses),
+        "items_por_jarron": sintetico.items,
+        "etapas": etapas,
+    }
+
+
+def comparar(reporte, base, tolerancia):
+    """Stages slower than baseline * (1 + tolerancia), matched by row count."""
+    regresiones = []
+    previos = {r["filas"]: r["etapas"] for r in base["resultados"]}
+    for resultado in reporte["resultados"]:
+        etapas_base = previos.get(resultado["filas"], {})
+        for etapa, medida in resultado["etapas"].items():
+            anterior = etapas_base.get(etapa, {}).get("segundos")
+            if anterior is None or "segundos" not in medida:
+                continue
+            if medida["segundos"] > anterior * (1 + tolerancia):
+                regresiones.append((resultado["filas"], etapa, anterior, medida["segundos"]))
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamaños", default=",".join(str(t) for t in TAMAÑOS),
+                        help="Filas aproximadas por historial, separadas por coma (default: 10k, 1M, 10M)")
+    parser.add_argument("--años", type=int, default=10)
+    parser.add_argument("--meses", type=int, default=12, choices=range(1, 13), metavar="1-12")
+    parser.add_argument("--items", type=int, help="Gastos por jarrón y mes (ignora --tamaños)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--csv", help="Solo escribir el historial sintético en este CSV y salir")
+    parser.add_argument("--sin-memoria", action="store_true", help="No medir el pico de memoria")
+    parser.add_argument("--salida", help="Guardar el reporte JSON en esta ruta")
+    parser.add_argument("--baseline", help="Reporte JSON previo con el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.20,
+                        help="Aumento relativo permitido por etapa (default: 0.20)")
+    args = parser.parse_args(argv)
+
+    if args.items:
+        sinteticos = [HistorialSintetico(args.años, args.meses, args.items, args.semilla)]
+    else:
+        sinteticos = [
+            HistorialSintetico.para_filas(int(float(t)), args.años, args.meses, args.semilla)
+            for t in args.tamaños.split(",")
+        ]
+
+    if args.csv:
+        sintetico = sinteticos[0]
+        sintetico.escribir_csv(args.csv)
+        print(f"{sintetico.filas} filas escritas en {args.csv}")
+        return 0
+
+    # Load the lazily imported dependencies up front: cold-start cost is
+    # importtime.py's job, here only steady-state work is measured
+    import matplotlib.figure  # noqa: F401
+    import pandas  # noqa: F401
+    import xlsxwriter  # noqa: F401
+
+    reporte = {"python": sys.version.split()[0], "resultados": []}
+    for sintetico in sinteticos:
+        print(f"{sintetico.filas} filas ({sintetico.años} años x {len(sintetico.meses)} meses, "
+              f"{sintetico.items} gastos por jarrón):")
+        resultado = medir_tamaño(sintetico, memoria=not args.sin_memoria)
+        for etapa, medida in resultado["etapas"].items():
+            memoria = f"  {medida['pico_mb']:9.1f} MB" if "pico_mb" in medida else ""
+            generacion = (
+                f"  (generación {medida['generacion_segundos']:.3f} s)" if "generacion_segundos" in medida else ""
+            )
+            print(f"  {etapa:22} {medida['segundos']:9.3f} s{memoria}{generacion}")
+        reporte["resultados"].append(resultado)
+    # Whole-process high-water mark (KiB on Linux), SQLite included
+    reporte["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    codigo_salida = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)
+        for filas, etapa, anterior, actual in comparar(reporte, base, args.tolerancia):
+            print(f"ERROR: regresión en {etapa} con {filas} filas: {anterior:.3f} s -> {actual:.3f} s")
+            codigo_salida = 1
+    if args.salida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+    return codigo_salida
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
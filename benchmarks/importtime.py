@@ -0,0 +1,109 @@
+"""Cold-start import report for the modules loaded by app6.py.
+
+Runs ``python -X importtime`` in a fresh interpreter, summarizes the slowest
+imports and checks that heavy optional dependencies stay deferred. With
+``--baseline`` it compares against a previous JSON report and exits with
+status 1 when total import time regresses beyond ``--tolerancia``.
+
+    python benchmarks/importtime.py --salida benchmarks/resultados/importtime.json
+    python benchmarks/importtime.py --baseline benchmarks/resultados/importtime.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules imported at the top of app6.py
+MODULOS_APP = [
+    "streamlit",
+    "config_jarrones",
+    "historial_store",
+    "gastos_sesion",
+    "diario_gastos",
+    "dinero",
+    "motor_jarrones",
+    "historial_cache",
+    "resumenes",
+    "graficos",
+    "categorizacion",
+    "extractos",
+    "instrumentacion",
+    "usuarios",
+    "tendencias",
+]
+
+# Must not be imported until a chart/export/summary is actually produced
+DIFERIDOS = ["matplotlib", "xlsxwriter"]
+
+
+def medir(modulos=MODULOS_APP, repeticiones=3):
+    """Best-of-N import profile: {'total_us', 'modulos', 'top', 'cargados_diferidos'}."""
+    mejor = None
+    for _ in range(repeticiones):
+        codigo = "import " + ", ".join(modulos)
+        proceso = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", codigo],
+            cwd=RAIZ, capture_output=True, text=True, check=True,
+        )
+        tiempos = {}
+        total = 0
+        for linea in proceso.stderr.splitlines():
+            if not linea.startswith("import time:") or "cumulative" in linea:
+                continue
+            # "import time:  self [us] | cumulative | <indent>package"
+            _, acumulado, nombre = linea[len("import time:"):].split("|")
+            acumulado = int(acumulado)
+            tiempos[nombre.strip()] = acumulado
+            if nombre[1:2] != " ":
+                total += acumulado  # top-level import (not indented)
+        if mejor is None or total < mejor["total_us"]:
+            mejor = {"total_us": total, "tiempos": tiempos}
+
+    tiempos = mejor["tiempos"]
+    return {
+        "python": sys.version.split()[0],
+        "total_us": mejor["total_us"],
+        "modulos": {m: tiempos.get(m) for m in modulos},
+        "top": sorted(tiempos.items(), key=lambda kv: kv[1], reverse=True)[:15],
+        "cargados_diferidos": [m for m in DIFERIDOS if m in tiempos],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--salida", help="Guardar el reporte JSON en esta ruta")
+    parser.add_argument("--baseline", help="Reporte JSON previo con el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.20,
+                        help="Aumento relativo permitido del tiempo total (default: 0.20)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    reporte = medir(repeticiones=args.repeticiones)
+    print(f"Tiempo total de importación: {reporte['total_us'] / 1000:.1f} ms")
+    for nombre, us in reporte["top"]:
+        print(f"  {us / 1000:8.1f} ms  {nombre}")
+
+    codigo_salida = 0
+    if reporte["cargados_diferidos"]:
+        print(f"ERROR: dependencias pesadas importadas al inicio: {', '.join(reporte['cargados_diferidos'])}")
+        codigo_salida = 1
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)
+        limite = base["total_us"] * (1 + args.tolerancia)
+        print(f"Baseline: {base['total_us'] / 1000:.1f} ms (límite {limite / 1000:.1f} ms)")
+        if reporte["total_us"] > limite:
+            print("ERROR: regresión en el tiempo de arranque")
+            codigo_salida = 1
+    if args.salida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+    return codigo_salida
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import unicodedata
+from collections import deque
+from functools import lru_cache
+
+from config_jarrones import JARRON_RESIDUO, palabras_clave_subcategorias, subcategorias_listas
+from historial_store import escribir_atomico, ruta_usuario
+
+# --- Transaction Categorization ---
+# Maps bank transaction descriptions to a (jarrón, subcategoría) pair. A
+# description is first looked up in the user's learned corrections (exact
+# normalized text); otherwise the keyword table from config_jarrones is
+# searched with an Aho–Corasick automaton, so the cost per description does
+# not grow with the number of keywords. Unmatched transactions fall back to
+# the catch-all subcategory of JARRON_RESIDUO for the user to review.
+
+CATEGORIA_SIN_COINCIDENCIA = (JARRON_RESIDUO, subcategorias_listas[JARRON_RESIDUO][-1])
+ORIGEN_APRENDIDA = "aprendida"
+ORIGEN_PALABRA_CLAVE = "palabra clave"
+ORIGEN_SIN_COINCIDENCIA = "sin coincidencia"
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+
+
+def normalizar(texto):
+    """Lowercase, accent-free, single-spaced text padded with one space on each side."""
+    sin_acentos = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    return f" {_NO_ALFANUMERICO.sub(' ', sin_acentos.lower()).strip()} "
+
+
+class IndicePalabrasClave:
+    """Aho–Corasick automaton over normalized keywords.
+
+    Keywords are padded with spaces like the normalized text, so they only
+    match whole words. `buscar` returns the value of the longest keyword found
+    (the first one in the text on ties) in a single pass.
+    """
+
+    def __init__(self, palabras):
+        # Trie as parallel lists indexed by node: children, failure link and
+        # (length, value) of the longest keyword ending at the node
+        self._hijos = [{}]
+        self._fallo = [0]
+        self._salida = [None]
+        for palabra, valor in palabras.items():
+            nodo = 0
+            for caracter in normalizar(palabra):
+                siguiente = self._hijos[nodo].get(caracter)
+                if siguiente is None:
+                    siguiente = len(self._hijos)
+                    self._hijos[nodo][caracter] = siguiente
+                    self._hijos.append({})
+                    self._fallo.append(0)
+                    self._salida.append(None)
+                nodo = siguiente
+            self._salida[nodo] = (len(normalizar(palabra)), valor)
+        self._enlazar()
+
+    def _enlazar(self):
+        # Breadth-first failure links; a node without its own keyword inherits
+        # the longest keyword that is a suffix of its path
+        pendientes = deque(self._hijos[0].values())
+        while pendientes:
+            nodo = pendientes.popleft()
+            for caracter, hijo in self._hijos[nodo].items():
+                fallo = self._fallo[nodo]
+                while fallo and caracter not in self._hijos[fallo]:
+                    fallo = self._fallo[fallo]
+                candidato = self._hijos[fallo].get(caracter, 0)
+                self._fallo[hijo] = candidato if candidato != hijo else 0
+                if self._salida[hijo] is None:
+                    self._salida[hijo] = self._salida[self._fallo[hijo]]
+                pendientes.append(hijo)
+
+    def buscar(self, texto_normalizado):
+        mejor = None
+        nodo = 0
+        for caracter in texto_normalizado:
+            while nodo and caracter not in self._hijos[nodo]:
+                nodo = self._fallo[nodo]
+            nodo = self._hijos[nodo].get(caracter, 0)
+            salida = self._salida[nodo]
+            if salida is not None and (mejor is None or salida[0] > mejor[0]):
+                mejor = salida
+        return None if mejor is None else mejor[1]
+
+
+@lru_cache(maxsize=1)
+def indice_predeterminado():
+    """Automaton for palabras_clave_subcategorias, built once per process."""
+    palabras = {}
+    for jarron, subcategorias in palabras_clave_subcategorias.items():
+        for sub, claves in subcategorias.items():
+            if sub not in subcategorias_listas[jarron]:
+                raise ValueError(f"Subcategoría desconocida en palabras clave: {jarron} / {sub}")
+            for clave in claves:
+                palabras[clave] = (jarron, sub)
+    return IndicePalabrasClave(palabras)
+
+
+def ruta_categorias_aprendidas(usuario):
+    """JSON file with a user's learned corrections, next to their history database."""
+    return os.path.splitext(ruta_usuario(usuario))[0] + ".categorias.json"
+
+
+class Categorizador:
+    """Learned corrections for one user on top of the keyword index."""
+
+    def __init__(self, ruta=None, indice=None):
+        self.ruta = ruta
+        self.indice = indice or indice_predeterminado()
+        self.aprendidas = {}
+        if ruta and os.path.exists(ruta):
+            with open(ruta, encoding="utf-8") as f:
+                self.aprendidas = {texto: tuple(categoria) for texto, categoria in json.load(f).items()}
+
+    def categorizar(self, descripcion):
+        """(jarrón, subcategoría, origen) for one description."""
+        texto = normalizar(descripcion)
+        aprendida = self.aprendidas.get(texto.strip())
+        if aprendida is not None:
+            return (*aprendida, ORIGEN_APRENDIDA)
+        encontrada = self.indice.buscar(texto)
+        if encontrada is not None:
+            return (*encontrada, ORIGEN_PALABRA_CLAVE)
+        return (*CATEGORIA_SIN_COINCIDENCIA, ORIGEN_SIN_COINCIDENCIA)
+
+    def categorizar_serie(self, descripciones):
+        """Jarrón, Subcategoría and Origen columns for a Series of descriptions.
+
+        Statements repeat the same merchants, so each distinct description is
+        categorized once and the result is mapped back.
+        """
+        import pandas as pd
+
+        codigos, unicas = pd.factorize(descripciones.fillna(""), sort=False)
+        categorias = pd.DataFrame(
+            [self.categorizar(d) for d in unicas], columns=["Jarrón", "Subcategoría", "Origen"]
+        )
+        return categorias.iloc[codigos].reset_index(drop=True).set_axis(descripciones.index)
+
+    def aprender(self, correcciones):
+        """Remember (descripción, jarrón, subcategoría) corrections and persist them."""
+        for descripcion, jarron, sub in correcciones:
+            if sub not in subcategorias_listas.get(jarron, ()):
+                raise ValueError(f"Subcategoría desconocida: {jarron} / {sub}")
+            self.aprendidas[normalizar(descripcion).strip()] = (jarron, sub)
+        if self.ruta:
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            datos = json.dumps({texto: list(c) for texto, c in self.aprendidas.items()}, ensure_ascii=False, indent=1)
+            escribir_atomico(self.ruta, datos.encode("utf-8"))
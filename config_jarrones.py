@@ -0,0 +1,93 @@
+# --- Static Configuration ---
+# Tables shared by the app and its helper modules. Built once at import time
+# (Streamlit keeps imported modules across reruns) instead of on every rerun.
+
+# --- Jar Percentages ---
+porcentajes = {
+    "Gastos básicos": 0.55,
+    "Inversiones a largo plazo": 0.10,
+    "Educación": 0.10,
+    "Invertir": 0.10,
+    "Diversión": 0.10,
+    "Donar": 0.05
+}
+
+# Jar that receives the cents left over when the income does not split exactly
+JARRON_RESIDUO = "Gastos básicos"
+
+# --- Predefined Subcategories ---
+subcategorias_listas = {
+    # "Deudas" and "Colegio o Universidad" are now in "Gastos básicos"
+    "Gastos básicos": ["Deudas", "Arriendo / Hipoteca", "Servicios públicos", "Alimentación", "Transporte", "Colegio o Universidad", "Otros Gastos Básicos"],
+    "Inversiones a largo plazo": ["Carro", "Casa", "Negocio propio", "Ahorro programado", "Otros Inversiones Largo Plazo"],
+    # "Colegio o Universidad" removed from "Educación"
+    "Educación": ["Cursos online", "Libros", "Talleres", "Certificaciones", "Otros Educación"],
+    "Invertir": ["CDTs", "Bitcoins", "Acciones", "Fondos de inversión", "Otros Inversiones"],
+    "Diversión": ["Viajes", "Restaurantes", "Cine / Entretenimiento", "Compras personales", "Otros Diversión"],
+    "Donar": ["Fundaciones", "Familia / Amigos", "Proyectos sociales", "Iglesia / Comunidad", "Otros Donar"],
+}
+
+# --- Bank Statement Keywords ---
+# Merchant/description keywords used to categorize imported bank transactions.
+# Written lowercase without accents (descriptions are normalized the same way)
+# and matched as whole words; when several match, the longest keyword wins.
+palabras_clave_subcategorias = {
+    "Gastos básicos": {
+        "Deudas": ["cuota credito", "pago tarjeta", "pago tc", "abono credito", "prestamo", "intereses"],
+        "Arriendo / Hipoteca": ["arriendo", "arrendamiento", "hipoteca", "inmobiliaria", "administracion"],
+        "Servicios públicos": ["epm", "codensa", "enel", "vanti", "gas natural", "acueducto", "energia",
+                               "claro", "movistar", "tigo", "etb", "internet"],
+        "Alimentación": ["exito", "carulla", "jumbo", "olimpica", "d1", "ara", "makro", "supermercado",
+                         "mercado", "panaderia", "fruver"],
+        "Transporte": ["uber", "didi", "cabify", "taxi", "transmilenio", "metro", "peaje", "gasolina",
+                       "terpel", "texaco", "primax", "parqueadero"],
+        "Colegio o Universidad": ["colegio", "universidad", "matricula", "pension escolar"],
+        "Otros Gastos Básicos": ["farmacia", "drogueria", "cruz verde", "eps", "seguro"],
+    },
+    "Inversiones a largo plazo": {
+        "Carro": ["concesionario", "cuota vehiculo", "soat"],
+        "Casa": ["constructora", "cuota inicial", "fiducia"],
+        "Negocio propio": ["proveedor", "camara de comercio"],
+        "Ahorro programado": ["ahorro programado", "afc", "pension voluntaria"],
+    },
+    "Educación": {
+        "Cursos online": ["udemy", "coursera", "platzi", "domestika", "edx"],
+        "Libros": ["libreria", "panamericana", "kindle", "audible"],
+        "Talleres": ["taller", "seminario"],
+        "Certificaciones": ["certificacion", "icfes"],
+    },
+    "Invertir": {
+        "CDTs": ["cdt"],
+        "Bitcoins": ["binance", "bitcoin", "btc", "coinbase", "buda"],
+        "Acciones": ["trii", "acciones", "bolsa de valores", "etoro"],
+        "Fondos de inversión": ["fondo de inversion", "fic", "tyba", "fiduciaria"],
+    },
+    "Diversión": {
+        "Viajes": ["avianca", "latam", "wingo", "hotel", "airbnb", "booking", "despegar"],
+        "Restaurantes": ["restaurante", "rappi", "ifood", "mcdonalds", "burger", "frisby", "juan valdez",
+                         "starbucks", "cafe"],
+        "Cine / Entretenimiento": ["cine colombia", "cinemark", "procinal", "netflix", "spotify", "disney",
+                                   "hbo", "prime video", "steam", "playstation", "xbox"],
+        "Compras personales": ["falabella", "zara", "adidas", "nike", "mercado libre", "mercadolibre",
+                               "amazon", "arturo calle"],
+    },
+    "Donar": {
+        "Fundaciones": ["fundacion", "unicef", "cruz roja"],
+        "Familia / Amigos": ["mesada", "regalo"],
+        "Proyectos sociales": ["vaki", "donacion"],
+        "Iglesia / Comunidad": ["iglesia", "parroquia", "diezmo", "ofrenda"],
+    },
+}
+
+# --- Months ---
+mes_options = [
+    "Selecciona un Mes", # Initial placeholder option
+    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
+]
+
+# Month names to numbers, for chronological sorting
+meses_map = {
+    "Enero": 1, "Febrero": 2, "Marzo": 3, "Abril": 4, "Mayo": 5, "Junio": 6,
+    "Julio": 7, "Agosto": 8, "Septiembre": 9, "Octubre": 10, "Noviembre": 11, "Diciembre": 12
+}
@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+
+from config_jarrones import subcategorias_listas
+from gastos_sesion import GastosSesion
+from historial_store import ruta_usuario
+
+# --- In-Progress Month Journal ---
+# Every change to the session's expenses (add, edit, delete, bulk import) and
+# to the month being edited (income text, month, year) is appended to a
+# per-user JSON-lines journal and fsynced before it is applied, so a browser
+# refresh or a server restart does not lose the month. An autosave costs one
+# small append instead of rewriting the month.
+#
+# Every COMPACTAR_CADA records the journal is folded into the draft kept in the
+# history store (see HistorialStore.guardar_borrador) and truncated. A new
+# session rebuilds its expenses from the draft plus the records appended after
+# it; records are numbered, so a crash between saving the draft and truncating
+# the journal does not apply anything twice. A torn last line (crash mid-write)
+# is ignored. Sessions of the same user in one server process share the journal.
+#
+# Edits and deletes name the expense by its id, not its position: when two tabs
+# of the same user interleave changes, replaying them touches the expense each
+# tab actually changed (or nothing, if the other tab deleted it). An added
+# expense's id is its record's sequence number; a bulk insert of k expenses
+# reserves the k numbers ending at its record's.
+#
+# Saving the month to the history appends a "guardado" record; only expense
+# changes after the last one are reported as unsaved when a session restores.
+
+COMPACTAR_CADA = 256
+# Records that change the session's expenses
+_OPERACIONES_GASTO = frozenset({"agregar", "editar", "eliminar", "lote"})
+
+_locks = {}
+_lock_registro = threading.Lock()
+
+
+def ruta_diario(usuario):
+    """Journal file of a user's in-progress month, next to their history database."""
+    return os.path.splitext(ruta_usuario(usuario))[0] + ".diario.jsonl"
+
+
+def _lock_para(ruta):
+    with _lock_registro:
+        return _locks.setdefault(os.path.abspath(ruta), threading.RLock())
+
+
+def _ids_lote(registro):
+    return range(registro["n"] - len(registro["centavos"]) + 1, registro["n"] + 1)
+
+
+def _posicion(gastos_jarron, registro):
+    # Journals written before expenses had ids recorded their position
+    if "id" not in registro:
+        return registro["indice"]
+    return gastos_jarron.posicion(registro["id"])
+
+
+def _aplicar(gastos, contexto, registro):
+    operacion = registro["op"]
+    if operacion == "agregar":
+        gastos[registro["jarron"]].agregar(registro["sub"], registro["centavos"], registro["n"])
+    elif operacion == "editar":
+        gastos_jarron = gastos[registro["jarron"]]
+        gastos_jarron.editar(_posicion(gastos_jarron, registro), sub=registro.get("sub"), monto=registro.get("centavos"))
+    elif operacion == "eliminar":
+        gastos_jarron = gastos[registro["jarron"]]
+        gastos_jarron.eliminar(_posicion(gastos_jarron, registro))
+    elif operacion == "lote":
+        gastos.agregar_lote(registro["jarrones"], registro["subs"], registro["centavos"], _ids_lote(registro))
+    elif operacion == "contexto":
+        contexto.clear()
+        contexto.update(registro["contexto"])
+    elif operacion == "descartar":
+        for jarron, gastos_jarron in gastos.jarrones.items():
+            while len(gastos_jarron):
+                gastos_jarron.eliminar(len(gastos_jarron) - 1)
+        contexto.clear()
+
+
+class DiarioGastos:
+    """Write-ahead journal of one user's in-progress month, checkpointed into `historial`."""
+
+    def __init__(self, ruta, historial, compactar_cada=COMPACTAR_CADA):
+        self.ruta = ruta
+        self.historial = historial
+        self.compactar_cada = compactar_cada
+        self._lock = _lock_para(ruta)
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with self._lock:
+            self._fd = os.open(ruta, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            registros, validos = self._leer()
+            if validos < os.fstat(self._fd).st_size:
+                # Drop a torn last line so new records are not appended after it
+                os.ftruncate(self._fd, validos)
+                os.fsync(self._fd)
+            secuencia_borrador, _, filas_borrador, _ = self.historial.cargar_borrador()
+            # Ids are drawn from the sequence too, so it starts past every id in use
+            self._secuencia = max([secuencia_borrador] + [r["n"] for r in registros] + [f[0] for f in filas_borrador])
+            self._pendientes = len(registros)
+
+    def _leer(self):
+        # (records, bytes of the file they span); stops at the first incomplete line
+        registros = []
+        validos = 0
+        try:
+            with open(self.ruta, "rb") as f:
+                for linea in f:
+                    if not linea.endswith(b"\n"):
+                        break
+                    try:
+                        registros.append(json.loads(linea))
+                    except (UnicodeDecodeError, json.JSONDecodeError):
+                        break
+                    validos += len(linea)
+        except FileNotFoundError:
+            pass
+        return registros, validos
+
+    def _anexar(self, registro, reservar=1):
+        # Returns the record's sequence number; `reservar` numbers end at it
+        with self._lock:
+            self._secuencia += reservar
+            registro["n"] = self._secuencia
+            os.write(self._fd, (json.dumps(registro, ensure_ascii=False) + "\n").encode("utf-8"))
+            os.fsync(self._fd)
+            self._pendientes += 1
+            if self._pendientes >= self.compactar_cada:
+                self.compactar()
+            return registro["n"]
+
+    def agregar(self, jarron, sub, centavos):
+        """Journal a new expense; returns the id to add it with."""
+        return self._anexar({"op": "agregar", "jarron": jarron, "sub": sub, "centavos": int(centavos)})
+
+    def editar(self, jarron, id, sub=None, centavos=None):
+        self._anexar({"op": "editar", "jarron": jarron, "id": int(id), "sub": sub,
+                      "centavos": None if centavos is None else int(centavos)})
+
+    def eliminar(self, jarron, id):
+        self._anexar({"op": "eliminar", "jarron": jarron, "id": int(id)})
+
+    def agregar_lote(self, jarrones, subs, centavos):
+        """One record for a whole bulk insert (e.g. a bank statement import); returns the ids to add it with."""
+        registro = {"op": "lote", "jarrones": [str(j) for j in jarrones], "subs": [str(s) for s in subs],
+                    "centavos": [int(c) for c in centavos]}
+        self._anexar(registro, reservar=max(len(registro["centavos"]), 1))
+        return _ids_lote(registro)
+
+    def contexto(self, contexto):
+        """Record the month being edited (income text, month, year) as a JSON-serializable dict."""
+        self._anexar({"op": "contexto", "contexto": dict(contexto)})
+
+    def descartar(self):
+        """Start over: the restored month is emptied (and the draft with it at the next checkpoint)."""
+        with self._lock:
+            self._anexar({"op": "descartar"})
+            self.compactar()
+
+    def guardado(self):
+        """Mark the current month as saved to the history (checkpoints the journal)."""
+        with self._lock:
+            self._anexar({"op": "guardado"})
+            self.compactar()
+
+    def restaurar(self):
+        """(GastosSesion, contexto, sin_guardar) rebuilt from the draft and the journal records after it.
+
+        `sin_guardar` counts the expense changes made since the last save.
+        Records that no longer apply (an unknown subcategory after a config
+        change, an expense another tab deleted) are skipped.
+        """
+        with self._lock:
+            secuencia, contexto, filas, sin_guardar = self.historial.cargar_borrador()
+            registros = [r for r in self._leer()[0] if r["n"] > secuencia]
+        gastos = GastosSesion(subcategorias_listas)
+        contexto = dict(contexto)
+        filas = [fila for fila in filas if fila[2] in subcategorias_listas.get(fila[1], ())]
+        if filas:
+            ids, jarrones, subs, centavos = zip(*filas)
+            gastos.agregar_lote(jarrones, subs, centavos, ids)
+        for registro in registros:
+            if registro["op"] in ("guardado", "descartar"):
+                sin_guardar = 0
+            try:
+                _aplicar(gastos, contexto, registro)
+            except (KeyError, ValueError, IndexError):
+                continue
+            if registro["op"] in _OPERACIONES_GASTO:
+                sin_guardar += len(registro["centavos"]) if registro["op"] == "lote" else 1
+        return gastos, contexto, sin_guardar
+
+    def compactar(self):
+        """Fold the journal into the store's draft and truncate it."""
+        with self._lock:
+            gastos, contexto, sin_guardar = self.restaurar()
+            self.historial.guardar_borrador(self._secuencia, contexto, list(gastos.filas_con_id()), sin_guardar)
+            os.ftruncate(self._fd, 0)
+            os.fsync(self._fd)
+            self._pendientes = 0
+
+    def cerrar(self):
+        with self._lock:
+            os.close(self._fd)
@@ -0,0 +1,93 @@
+import re
+from decimal import Decimal, ROUND_HALF_UP
+
+# --- Money Core ---
+# Every amount is handled as an integer number of cents (int64 in NumPy/pandas).
+# Floats only appear at the edges: parsing user text, display and the legacy
+# "Monto asignado" column of the CSV/Excel exports.
+
+_CARACTERES_IGNORADOS = re.compile(r"[\s$]")
+_DIGITOS = re.compile(r"[0-9]*")
+# Largest accepted amount (10 trillion pesos): far below int64, so sums over a
+# whole history of such amounts still fit SQLite integers and int64 arrays
+MAXIMO_CENTAVOS = 10**15
+
+
+def _es_grupo_inicial_miles(grupo):
+    # "1", "12", "123" can lead a thousands-grouped number; "1234" or "0" cannot
+    return 1 <= len(grupo) <= 3 and not grupo.startswith("0")
+
+
+def parse_monto(texto):
+    """Parse a user-typed amount into integer cents.
+
+    Accepts "2500000", "2500000.50", "2500000,50", "2.500.000,00" and
+    "2,500,000.00". When both separators appear the last one is the decimal
+    mark; a single separator followed by exactly three digits is read as a
+    thousands separator when the first group has 1-3 digits and does not start
+    with 0 ("1.500" -> 1500), otherwise as the decimal mark ("1234.567",
+    "0,001"). Raises ValueError on bad input or amounts above MAXIMO_CENTAVOS.
+    """
+    limpio = _CARACTERES_IGNORADOS.sub("", texto or "")
+    if not limpio:
+        raise ValueError("Monto vacío")
+    negativo = limpio.startswith("-")
+    if negativo:
+        limpio = limpio[1:]
+    if "." in limpio and "," in limpio:
+        decimal = "." if limpio.rfind(".") > limpio.rfind(",") else ","
+        miles = "," if decimal == "." else "."
+        entero, _, fraccion = limpio.rpartition(decimal)
+        if decimal in entero:
+            raise ValueError(f"Monto inválido: {texto!r}")
+        entero = entero.replace(miles, "")
+    elif "." in limpio or "," in limpio:
+        separador = "." if "." in limpio else ","
+        partes = limpio.split(separador)
+        if len(partes) > 2 or (len(partes[-1]) == 3 and _es_grupo_inicial_miles(partes[0])):
+            # Repeated separator, or "1.500"-style grouping: thousands
+            if not _es_grupo_inicial_miles(partes[0]) or any(len(p) != 3 for p in partes[1:]):
+                raise ValueError(f"Monto inválido: {texto!r}")
+            entero, fraccion = "".join(partes), ""
+        else:
+            entero, fraccion = partes
+    else:
+        entero, fraccion = limpio, ""
+    if not (entero or fraccion) or not _DIGITOS.fullmatch(entero) or not _DIGITOS.fullmatch(fraccion):
+        raise ValueError(f"Monto inválido: {texto!r}")
+    valor = Decimal(f"{entero or '0'}.{fraccion or '0'}")
+    centavos = int((valor * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    if centavos > MAXIMO_CENTAVOS:
+        raise ValueError(f"Monto demasiado grande: {texto!r}")
+    return -centavos if negativo else centavos
+
+
+def a_centavos(pesos):
+    """Convert a float amount in pesos (e.g. from a legacy CSV) to cents."""
+    return int(Decimal(repr(float(pesos))).scaleb(2).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def a_pesos(centavos):
+    """Cents -> pesos as float (scalar or NumPy/pandas array) for display and exports."""
+    return centavos / 100
+
+
+def formatear(centavos):
+    """Format cents as "1234.56" (same output as f"{pesos:.2f}", without float rounding)."""
+    signo = "-" if centavos < 0 else ""
+    entero, resto = divmod(abs(int(centavos)), 100)
+    return f"{signo}{entero}.{resto:02d}"
+
+
+def repartir(total_centavos, porcentajes, jarron_residuo):
+    """Split `total_centavos` exactly by `porcentajes`.
+
+    Each jar gets floor(total * share); the cents lost to flooring go to
+    `jarron_residuo`, so the parts always add up to the total.
+    """
+    puntos = {jarron: int(round(p * 10000)) for jarron, p in porcentajes.items()}
+    if sum(puntos.values()) != 10000:
+        raise ValueError("Los porcentajes de los jarrones deben sumar 100%")
+    partes = {jarron: total_centavos * pb // 10000 for jarron, pb in puntos.items()}
+    partes[jarron_residuo] += total_centavos - sum(partes.values())
+    return partes
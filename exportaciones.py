@@ -0,0 +1,81 @@
+import csv
+import io
+
+from historial_store import COLUMNAS_HISTORIAL
+from resumenes import filtrar_años, resumen_anual_simplificado, resumen_mensual_simplificado
+
+# --- History Exports ---
+# CSV and Excel files are produced only when a download is requested. The raw
+# history is streamed from the store in batches; the Excel workbook is written
+# with xlsxwriter's constant_memory mode, which flushes each row as it goes.
+# Excel caps a worksheet at LIMITE_FILAS_EXCEL rows (xlsxwriter silently skips
+# the rest), so longer histories continue on "Historial Completo (2)", etc.
+
+TAMAÑO_LOTE = 50_000
+# Rows per worksheet supported by Excel (header included)
+LIMITE_FILAS_EXCEL = 1_048_576
+
+
+def _filas_legado(lote):
+    # Stored cents -> legacy "Monto asignado" in pesos
+    for año, mes, jarron, subcategoria, centavos in lote:
+        yield año, mes, jarron, subcategoria, centavos / 100
+
+
+def generar_csv(historial, año_desde=None, año_hasta=None, tamaño_lote=TAMAÑO_LOTE):
+    """History rows in [año_desde, año_hasta] as CSV bytes (legacy schema)."""
+    salida = io.StringIO()
+    escritor = csv.writer(salida, lineterminator="\n")
+    escritor.writerow(COLUMNAS_HISTORIAL)
+    for lote in historial.iterar_filas(tamaño_lote, año_desde, año_hasta):
+        escritor.writerows(_filas_legado(lote))
+    return salida.getvalue().encode("utf-8")
+
+
+def _escribir_hoja(libro, nombre, columnas, filas, formato_encabezado, limite_filas=LIMITE_FILAS_EXCEL):
+    filas_por_hoja = limite_filas - 1
+    hoja = libro.add_worksheet(nombre)
+    hoja.write_row(0, 0, columnas, formato_encabezado)
+    # constant_memory requires writing strictly row by row
+    for i, fila in enumerate(filas):
+        parte, fila_hoja = divmod(i, filas_por_hoja)
+        if parte and not fila_hoja:
+            hoja = libro.add_worksheet(f"{nombre} ({parte + 1})")
+            hoja.write_row(0, 0, columnas, formato_encabezado)
+        hoja.write_row(fila_hoja + 1, 0, fila)
+
+
+def generar_excel(historial, jarrones, año_desde=None, año_hasta=None, tamaño_lote=TAMAÑO_LOTE,
+                  limite_filas=LIMITE_FILAS_EXCEL):
+    """Workbook with the (filtered) history and its monthly/annual summaries.
+
+    The history is split over as many sheets as `limite_filas` requires.
+    """
+    import xlsxwriter
+
+    buffer = io.BytesIO()
+    libro = xlsxwriter.Workbook(buffer, {"constant_memory": True})
+    encabezado = libro.add_format({"bold": True, "border": 1})
+
+    filas_historial = (
+        fila
+        for lote in historial.iterar_filas(tamaño_lote, año_desde, año_hasta)
+        for fila in _filas_legado(lote)
+    )
+    _escribir_hoja(libro, "Historial Completo", COLUMNAS_HISTORIAL, filas_historial, encabezado, limite_filas)
+
+    df_mensual = resumen_mensual_simplificado(
+        filtrar_años(historial.resumen_mensual(), año_desde, año_hasta), jarrones
+    )
+    if not df_mensual.empty:
+        _escribir_hoja(libro, "Resumen Mensual", list(df_mensual.columns),
+                       df_mensual.astype(object).values.tolist(), encabezado)
+    df_anual = resumen_anual_simplificado(
+        filtrar_años(historial.resumen_anual(), año_desde, año_hasta), jarrones
+    )
+    if not df_anual.empty:
+        _escribir_hoja(libro, "Resumen Anual", list(df_anual.columns),
+                       df_anual.astype(object).values.tolist(), encabezado)
+
+    libro.close()
+    return buffer.getvalue()
@@ -0,0 +1,201 @@
+import csv
+import io
+import re
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from categorizacion import normalizar
+from dinero import MAXIMO_CENTAVOS, parse_monto
+
+# --- Bank Statement Readers ---
+# Bank CSV and OFX exports are read in blocks of `tamaño_bloque` transactions,
+# so statements of any size never have to fit in memory at once. Every block is
+# a DataFrame with Fecha, Descripción and Centavos (positive int64 cents) that
+# holds only expenses: debits, or negative amounts when the file has a single
+# signed amount column. Credits (deposits, refunds) are skipped.
+
+TAMAÑO_BLOQUE = 5_000
+COLUMNAS_EXTRACTO = ["Fecha", "Descripción", "Centavos"]
+
+# Header names recognized in bank CSVs (normalized with categorizacion.normalizar)
+_CABECERAS_DESCRIPCION = ["descripcion", "concepto", "detalle", "comercio", "establecimiento",
+                          "description", "memo", "payee", "referencia"]
+_CABECERAS_DEBITO = ["debito", "debitos", "cargo", "cargos", "retiro", "retiros", "debit", "withdrawal"]
+_CABECERAS_MONTO = ["monto", "valor", "importe", "amount", "valor transaccion"]
+_CABECERAS_FECHA = ["fecha", "fecha transaccion", "date", "posted date"]
+
+_ETIQUETA_OFX = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+_TAMAÑO_LECTURA_OFX = 1 << 16
+
+
+def _buscar_columna(columnas, candidatas):
+    normalizadas = {normalizar(c).strip(): c for c in columnas}
+    for candidata in candidatas:
+        if candidata in normalizadas:
+            return normalizadas[candidata]
+    return None
+
+
+def _centavos(serie):
+    """Cents per row (NaN where the text is not an amount): numeric columns in one
+    vectorized pass, text through the locale-aware parser once per distinct value."""
+    import pandas as pd
+
+    if pd.api.types.is_numeric_dtype(serie):
+        return (serie.astype("float64") * 100).round()
+
+    def convertir(texto):
+        try:
+            return parse_monto(texto)
+        except ValueError:
+            return None
+
+    codigos, unicas = pd.factorize(serie.astype("string").fillna(""), sort=False)
+    valores = pd.array([convertir(texto) for texto in unicas], dtype="Float64")
+    return pd.Series(valores[codigos], index=serie.index, dtype="float64")
+
+
+def _centavos_ofx(texto):
+    """Signed cents of an OFX TRNAMT. OFX amounts have a single decimal mark
+    ("." or ",") and no thousands grouping, so "-12.345" is -12.345 pesos."""
+    try:
+        valor = Decimal(texto.strip().replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"Monto OFX inválido: {texto!r}") from None
+    if not valor.is_finite():
+        raise ValueError(f"Monto OFX inválido: {texto!r}")
+    if abs(valor * 100) > MAXIMO_CENTAVOS:
+        raise ValueError(f"Monto demasiado grande: {texto!r}")
+    return int((valor * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+@contextmanager
+def _abrir_texto(archivo):
+    # Bank exports come in UTF-8 or Latin-1; Latin-1 decodes any byte sequence
+    archivo.seek(0)
+    muestra = archivo.read(_TAMAÑO_LECTURA_OFX)
+    archivo.seek(0)
+    try:
+        muestra.decode("utf-8-sig")
+        codificacion = "utf-8-sig"
+    except UnicodeDecodeError:
+        codificacion = "latin-1"
+    texto = io.TextIOWrapper(archivo, encoding=codificacion, errors="replace", newline="")
+    try:
+        yield texto
+    finally:
+        texto.detach() # Leave the caller's file open (e.g. Streamlit's upload)
+
+
+def leer_csv(archivo, tamaño_bloque=TAMAÑO_BLOQUE):
+    """Yield expense blocks from a bank CSV (binary file object)."""
+    import pandas as pd
+
+    with _abrir_texto(archivo) as texto:
+        muestra = texto.read(_TAMAÑO_LECTURA_OFX)
+        texto.seek(0)
+        try:
+            separador = csv.Sniffer().sniff(muestra, delimiters=",;\t|").delimiter
+        except csv.Error:
+            separador = ","
+        lector = pd.read_csv(texto, sep=separador, dtype=str, chunksize=tamaño_bloque, skipinitialspace=True)
+        columnas = None
+        for bloque in lector:
+            if columnas is None:
+                columnas = {
+                    "descripcion": _buscar_columna(bloque.columns, _CABECERAS_DESCRIPCION),
+                    "debito": _buscar_columna(bloque.columns, _CABECERAS_DEBITO),
+                    "monto": _buscar_columna(bloque.columns, _CABECERAS_MONTO),
+                    "fecha": _buscar_columna(bloque.columns, _CABECERAS_FECHA),
+                }
+                if columnas["descripcion"] is None or (columnas["debito"] or columnas["monto"]) is None:
+                    raise ValueError(
+                        "El extracto debe tener una columna de descripción y una de monto o débito "
+                        f"(columnas encontradas: {', '.join(bloque.columns)})"
+                    )
+            if columnas["debito"] is not None:
+                centavos = _centavos(bloque[columnas["debito"]]).abs()
+            else:
+                # Single signed column: charges are negative
+                centavos = -_centavos(bloque[columnas["monto"]])
+            gasto = centavos > 0
+            yield pd.DataFrame({
+                "Fecha": bloque[columnas["fecha"]][gasto] if columnas["fecha"] else None,
+                "Descripción": bloque.loc[gasto, columnas["descripcion"]].fillna(""),
+                "Centavos": centavos[gasto].astype("int64"),
+            }, columns=COLUMNAS_EXTRACTO).reset_index(drop=True)
+
+
+def _etiquetas_ofx(texto):
+    # Incremental tag scan: works for SGML OFX 1.x (unclosed leaf tags, one per
+    # line) and XML OFX 2.x (possibly everything on one line)
+    resto = ""
+    while True:
+        leido = texto.read(_TAMAÑO_LECTURA_OFX)
+        buffer = resto + leido
+        # A tag's value ends at the next "<": only scan up to the last one
+        corte = buffer.rfind("<") if leido else len(buffer)
+        for coincidencia in _ETIQUETA_OFX.finditer(buffer, 0, max(corte, 0)):
+            cierre, nombre, valor = coincidencia.groups()
+            yield bool(cierre), nombre.upper(), valor.strip()
+        if not leido:
+            return
+        resto = buffer[corte:] if corte >= 0 else buffer
+
+
+def leer_ofx(archivo, tamaño_bloque=TAMAÑO_BLOQUE):
+    """Yield expense blocks from an OFX/QFX statement (binary file object)."""
+    import pandas as pd
+
+    transacciones = []
+    actual = None
+    with _abrir_texto(archivo) as texto:
+        for cierre, nombre, valor in _etiquetas_ofx(texto):
+            if nombre == "STMTTRN":
+                if not cierre:
+                    actual = {}
+                    continue
+                if actual is not None and "TRNAMT" in actual:
+                    try:
+                        centavos = -_centavos_ofx(actual["TRNAMT"])
+                    except ValueError:
+                        centavos = 0
+                    if centavos > 0:
+                        fecha = actual.get("DTPOSTED", "")[:8]
+                        transacciones.append((
+                            f"{fecha[:4]}-{fecha[4:6]}-{fecha[6:8]}" if len(fecha) == 8 else None,
+                            " ".join(filter(None, [actual.get("NAME"), actual.get("MEMO")])),
+                            centavos,
+                        ))
+                actual = None
+                if len(transacciones) >= tamaño_bloque:
+                    yield pd.DataFrame(transacciones, columns=COLUMNAS_EXTRACTO)
+                    transacciones = []
+            elif actual is not None and not cierre:
+                actual[nombre] = valor
+    if transacciones:
+        yield pd.DataFrame(transacciones, columns=COLUMNAS_EXTRACTO)
+
+
+def leer_extracto(archivo, nombre, tamaño_bloque=TAMAÑO_BLOQUE):
+    """Expense blocks from a CSV or OFX/QFX statement, chosen by file name."""
+    if nombre.lower().endswith((".ofx", ".qfx")):
+        return leer_ofx(archivo, tamaño_bloque)
+    return leer_csv(archivo, tamaño_bloque)
+
+
+def categorizar_extracto(archivo, nombre, categorizador, tamaño_bloque=TAMAÑO_BLOQUE):
+    """Read and categorize a whole statement block by block.
+
+    Returns one DataFrame with Fecha, Descripción, Centavos, Jarrón,
+    Subcategoría and Origen (how the category was chosen).
+    """
+    import pandas as pd
+
+    bloques = [
+        pd.concat([bloque, categorizador.categorizar_serie(bloque["Descripción"])], axis=1)
+        for bloque in leer_extracto(archivo, nombre, tamaño_bloque)
+    ]
+    if not bloques:
+        return pd.DataFrame(columns=COLUMNAS_EXTRACTO + ["Jarrón", "Subcategoría", "Origen"])
+    return pd.concat(bloques, ignore_index=True)
@@ -0,0 +1,202 @@
+import numpy as np
+
+from dinero import a_pesos
+
+# --- Session Expense Store ---
+# Expenses of the month being edited, kept per jar as parallel NumPy arrays
+# (subcategory code + amount in int64 cents + stable id) with running totals,
+# so reruns read totals in O(1) and display tables are built from array views
+# instead of lists of dicts. Ids stay with an expense when earlier ones are
+# deleted, so the journal (see diario_gastos) can refer to it unambiguously.
+
+_CAPACIDAD_INICIAL = 16
+
+
+class GastosJarron:
+    """Expenses of a single jar."""
+
+    __slots__ = (
+        "subcategorias", "_indice_sub", "_codigos", "_montos", "_ids", "_n", "_siguiente_id", "total", "totales_sub"
+    )
+
+    def __init__(self, subcategorias):
+        self.subcategorias = list(subcategorias)
+        self._indice_sub = {sub: i for i, sub in enumerate(self.subcategorias)}
+        self._codigos = np.empty(_CAPACIDAD_INICIAL, dtype=np.int16)
+        self._montos = np.empty(_CAPACIDAD_INICIAL, dtype=np.int64)
+        self._ids = np.empty(_CAPACIDAD_INICIAL, dtype=np.int64)
+        self._n = 0
+        self._siguiente_id = 1
+        self.total = 0
+        self.totales_sub = [0] * len(self.subcategorias)
+
+    def __len__(self):
+        return self._n
+
+    def _codigo(self, sub):
+        try:
+            return self._indice_sub[sub]
+        except KeyError:
+            raise ValueError(f"Subcategoría desconocida: {sub!r}") from None
+
+    def _verificar_indice(self, i):
+        if not 0 <= i < self._n:
+            raise IndexError(f"No existe el gasto #{i}")
+
+    def agregar(self, sub, monto, id=None):
+        """Append an expense of `monto` cents; returns its id (the next free one unless given)."""
+        codigo = self._codigo(sub)
+        if id is None:
+            id = self._siguiente_id
+        if self._n == len(self._montos):
+            # Amortized O(1) growth: double the backing arrays
+            self._codigos = np.resize(self._codigos, 2 * self._n)
+            self._montos = np.resize(self._montos, 2 * self._n)
+            self._ids = np.resize(self._ids, 2 * self._n)
+        self._codigos[self._n] = codigo
+        self._montos[self._n] = monto
+        self._ids[self._n] = id
+        self._n += 1
+        self._siguiente_id = max(self._siguiente_id, id + 1)
+        self.total += monto
+        self.totales_sub[codigo] += monto
+        return id
+
+    def agregar_lote(self, subs, montos, ids=None):
+        """Append many expenses at once: `subs` names and `montos` cents, in order.
+
+        The backing arrays grow at most once and the running totals are
+        updated with one vectorized pass. `ids` default to the next free ones.
+        """
+        montos = np.asarray(montos, dtype=np.int64)
+        if len(montos) == 0:
+            return
+        if ids is None:
+            ids = np.arange(self._siguiente_id, self._siguiente_id + len(montos), dtype=np.int64)
+        ids = np.asarray(ids, dtype=np.int64)
+        codigos = np.fromiter((self._codigo(sub) for sub in subs), dtype=np.int16, count=len(montos))
+        fin = self._n + len(montos)
+        if fin > len(self._montos):
+            capacidad = max(2 * len(self._montos), fin)
+            self._codigos = np.resize(self._codigos, capacidad)
+            self._montos = np.resize(self._montos, capacidad)
+            self._ids = np.resize(self._ids, capacidad)
+        self._codigos[self._n:fin] = codigos
+        self._montos[self._n:fin] = montos
+        self._ids[self._n:fin] = ids
+        self._n = fin
+        self._siguiente_id = max(self._siguiente_id, int(ids.max()) + 1)
+        self.total += int(montos.sum())
+        sumas = np.zeros(len(self.subcategorias), dtype=np.int64)
+        np.add.at(sumas, codigos, montos)
+        for codigo, suma in enumerate(sumas.tolist()):
+            self.totales_sub[codigo] += suma
+
+    def editar(self, i, sub=None, monto=None):
+        self._verificar_indice(i)
+        codigo_ant, monto_ant = int(self._codigos[i]), int(self._montos[i])
+        codigo = codigo_ant if sub is None else self._codigo(sub)
+        monto = monto_ant if monto is None else monto
+        self.totales_sub[codigo_ant] -= monto_ant
+        self.totales_sub[codigo] += monto
+        self.total += monto - monto_ant
+        self._codigos[i] = codigo
+        self._montos[i] = monto
+
+    def eliminar(self, i):
+        self._verificar_indice(i)
+        monto = int(self._montos[i])
+        self.totales_sub[int(self._codigos[i])] -= monto
+        self.total -= monto
+        # Shift the tail left in place (keeps insertion order for display)
+        self._codigos[i:self._n - 1] = self._codigos[i + 1:self._n]
+        self._montos[i:self._n - 1] = self._montos[i + 1:self._n]
+        self._ids[i:self._n - 1] = self._ids[i + 1:self._n]
+        self._n -= 1
+
+    def id(self, i):
+        """Stable id of the expense currently at position `i`."""
+        self._verificar_indice(i)
+        return int(self._ids[i])
+
+    def posicion(self, id):
+        """Current position of the expense with this id."""
+        encontrados = np.flatnonzero(self._ids[:self._n] == id)
+        if not len(encontrados):
+            raise KeyError(f"No existe el gasto con id {id}")
+        return int(encontrados[0])
+
+    def monto(self, i):
+        self._verificar_indice(i)
+        return int(self._montos[i])
+
+    def subcategoria(self, i):
+        self._verificar_indice(i)
+        return self.subcategorias[int(self._codigos[i])]
+
+    def vista(self):
+        """Display table built on views of the backing arrays (no per-row objects).
+
+        Amounts are shown in pesos, converted in one vectorized pass.
+        """
+        import pandas as pd
+
+        return pd.DataFrame(
+            {
+                "Subcategoría": pd.Categorical.from_codes(self._codigos[:self._n], self.subcategorias),
+                "Monto Asignado": a_pesos(self._montos[:self._n]),
+            },
+            copy=False,
+        )
+
+    def items(self):
+        """Yield (subcategoría, centavos) pairs in insertion order."""
+        for codigo, monto in zip(self._codigos[:self._n].tolist(), self._montos[:self._n].tolist()):
+            yield self.subcategorias[codigo], monto
+
+
+class GastosSesion:
+    """Per-jar expense stores for the month being edited."""
+
+    __slots__ = ("jarrones",)
+
+    def __init__(self, subcategorias_listas):
+        self.jarrones = {jarron: GastosJarron(subs) for jarron, subs in subcategorias_listas.items()}
+
+    def __getitem__(self, jarron):
+        return self.jarrones[jarron]
+
+    def __contains__(self, jarron):
+        return jarron in self.jarrones
+
+    @property
+    def total(self):
+        # Sum of six running totals, independent of the number of expenses
+        return sum(gastos.total for gastos in self.jarrones.values())
+
+    def agregar_lote(self, jarrones, subs, montos, ids=None):
+        """Append a batch of (jarrón, subcategoría, centavos) expenses, one bulk insert per jar."""
+        nombres = list(self.jarrones)
+        indice = {jarron: i for i, jarron in enumerate(nombres)}
+        codigos = np.fromiter((indice[j] for j in jarrones), dtype=np.intp, count=len(montos))
+        subs = np.asarray(subs, dtype=object)
+        montos = np.asarray(montos, dtype=np.int64)
+        if ids is not None:
+            ids = np.asarray(ids, dtype=np.int64)
+        for i in np.unique(codigos):
+            en_jarron = codigos == i
+            self.jarrones[nombres[i]].agregar_lote(
+                subs[en_jarron], montos[en_jarron], None if ids is None else ids[en_jarron]
+            )
+
+    def filas(self):
+        """Yield (jarrón, subcategoría, centavos) for every expense."""
+        for jarron, gastos in self.jarrones.items():
+            for sub, monto in gastos.items():
+                yield jarron, sub, monto
+
+    def filas_con_id(self):
+        """Yield (id, jarrón, subcategoría, centavos) for every expense."""
+        for jarron, gastos in self.jarrones.items():
+            for id, (sub, monto) in zip(gastos._ids[:gastos._n].tolist(), gastos.items()):
+                yield id, jarron, sub, monto
@@ -0,0 +1,68 @@
+import io
+import math
+from functools import lru_cache
+
+from dinero import a_pesos
+
+# --- Charts ---
+# All jars are drawn into one multi-panel figure using matplotlib's
+# object-oriented API (no pyplot global state). Rendered images are cached by
+# the plotted data itself, so saving the same month twice does not re-rasterize.
+# matplotlib is only imported when a figure is actually drawn.
+
+
+def datos_desde_sesion(gastos_sesion):
+    """Hashable chart data from the session store.
+
+    Returns ((jarrón, ((subcategoría, centavos), ...)), ...) with only the
+    subcategories that have something assigned; it reads the running
+    per-subcategory totals, so its cost does not depend on the number of expenses.
+    """
+    return tuple(
+        (jarron, tuple((sub, total) for sub, total in zip(gastos.subcategorias, gastos.totales_sub) if total > 0))
+        for jarron, gastos in gastos_sesion.jarrones.items()
+    )
+
+
+def totales_por_jarron(datos):
+    return [(jarron, sum(total for _, total in subs)) for jarron, subs in datos if subs]
+
+
+@lru_cache(maxsize=32)
+def renderizar_figura(datos, formato="png"):
+    """Pie of jar totals plus one bar panel per jar, as PNG or SVG bytes."""
+    from matplotlib.figure import Figure
+
+    jarrones_con_datos = [(jarron, subs) for jarron, subs in datos if subs]
+    totales = totales_por_jarron(datos)
+    paneles = 1 + len(jarrones_con_datos)
+    columnas = 2 if paneles > 1 else 1
+    filas = math.ceil(paneles / columnas)
+
+    fig = Figure(figsize=(8 * columnas, 6 * filas), layout="constrained")
+    ejes = fig.subplots(filas, columnas, squeeze=False).ravel()
+
+    ax_pie = ejes[0]
+    ax_pie.pie(
+        [a_pesos(total) for _, total in totales],
+        labels=[jarron for jarron, _ in totales],
+        autopct="%1.1f%%", startangle=90, pctdistance=0.85
+    )
+    ax_pie.axis("equal") # Equal aspect ratio ensures that pie is drawn as a circle.
+    ax_pie.set_title("Distribución General por Jarrón")
+
+    for ax, (jarron, subs) in zip(ejes[1:], jarrones_con_datos):
+        ax.bar([sub for sub, _ in subs], [a_pesos(total) for _, total in subs], color="skyblue")
+        ax.set_ylabel("Monto ($)")
+        ax.set_xlabel("Subcategorías")
+        ax.set_title(f"Distribución en '{jarron}'")
+        ax.tick_params(axis="x", labelrotation=45) # Rotate labels for better readability
+        for etiqueta in ax.get_xticklabels():
+            etiqueta.set_horizontalalignment("right")
+
+    for ax in ejes[paneles:]:
+        ax.set_visible(False)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=formato)
+    return buffer.getvalue()
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from exportaciones import generar_csv, generar_excel
+from historial_columnar import resumir_columnar
+from tendencias import analizar
+
+# --- History Read Cache ---
+# Streamlit reruns the whole script on every interaction. Results read from the
+# history (summaries, trends, exports) are kept in a process-wide cache keyed by
+# the store's version counter, so all reruns and browser sessions share one copy
+# until a save or "Borrar TODO" bumps the version. Cached results are shared:
+# callers must not mutate them.
+#
+# Each user's history (one store path) has its own cache, sized per user: a
+# write by one user drops only that user's results from older versions, and
+# active users never evict each other.
+
+# Most results kept per user for each kind of read
+MAXIMO_POR_USUARIO = {"resumenes": 1, "tendencias": 1, "exportacion": 4}
+
+_contadores = {"aciertos": 0, "fallos": 0}
+_lock_contadores = threading.Lock()
+
+
+class _CacheUsuario:
+    """Results computed from one user's history, for its latest version only."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._entradas = {tipo: OrderedDict() for tipo in MAXIMO_POR_USUARIO}
+
+    def obtener(self, tipo, version, clave, calcular):
+        """(result, computed) for `clave` at `version`; `calcular()` runs on a miss."""
+        with self._lock:
+            if self._version is None or version > self._version:
+                # A newer version makes every cached result of this user stale
+                self._version = version
+                for entradas in self._entradas.values():
+                    entradas.clear()
+            entradas = self._entradas[tipo]
+            if version == self._version and clave in entradas:
+                entradas.move_to_end(clave)
+                return entradas[clave], False
+        # Computed outside the lock so one slow export does not hold up the user's other reads
+        resultado = calcular()
+        with self._lock:
+            # A reader that raced with a write keeps its result to itself
+            if version == self._version:
+                entradas[clave] = resultado
+                while len(entradas) > MAXIMO_POR_USUARIO[tipo]:
+                    entradas.popitem(last=False)
+        return resultado, True
+
+
+# One cache per store path, shared by that user's sessions and pages
+@st.cache_resource(show_spinner=False)
+def _cache_usuario(ruta):
+    return _CacheUsuario()
+
+
+def _consultar(tipo, historial, calcular, *args):
+    resultado, fallo = _cache_usuario(historial.ruta).obtener(
+        tipo, historial.version(), args, lambda: calcular(historial, *args)
+    )
+    with _lock_contadores:
+        _contadores["fallos" if fallo else "aciertos"] += 1
+    return resultado
+
+
+def _resumenes(historial):
+    return historial.resumen_mensual(), historial.resumen_anual()
+
+
+def _tendencias(historial):
+    return analizar(resumir_columnar(historial, ["Año", "Mes_Num", "Jarrón", "Subcategoría"]))
+
+
+def _exportacion(historial, formato, jarrones, año_desde, año_hasta):
+    if formato == "csv":
+        return generar_csv(historial, año_desde, año_hasta)
+    return generar_excel(historial, jarrones, año_desde, año_hasta)
+
+
+def cargar_resumenes(historial):
+    """(resumen_mensual, resumen_anual) for the store's current version."""
+    return _consultar("resumenes", historial, _resumenes)
+
+
+def cargar_tendencias(historial):
+    """(evolucion, excesos, proyeccion) from tendencias.analizar for the store's current version."""
+    return _consultar("tendencias", historial, _tendencias)
+
+
+def exportar(historial, formato, jarrones, año_desde=None, año_hasta=None):
+    """CSV or Excel bytes for the store's current version and year range."""
+    return _consultar("exportacion", historial, _exportacion, formato, tuple(jarrones), año_desde, año_hasta)
+
+
+def estadisticas_cache():
+    with _lock_contadores:
+        return dict(_contadores)
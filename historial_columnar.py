@@ -0,0 +1,169 @@
+import os
+import threading
+
+import numpy as np
+
+from config_jarrones import meses_map
+from historial_store import archivo_atomico
+
+# --- Columnar History Snapshot ---
+# Analytics read the history from a typed Arrow IPC file next to the store's
+# database instead of materializing object-string rows from SQLite. Mes, Jarrón
+# and Subcategoría are dictionary (categorical) columns, Año and Mes_Num small
+# ints and Centavos int64. The file is uncompressed, so it is memory-mapped and
+# a query only pages in the columns it selects. The snapshot is derived data:
+# it carries the store version it was built from and is rebuilt on first read
+# after any write.
+
+COLUMNAS_COLUMNAR = ["Año", "Mes_Num", "Mes", "Jarrón", "Subcategoría", "Centavos"]
+FILAS_POR_LOTE = 100_000
+
+_locks = {}
+_lock_registro = threading.Lock()
+
+
+def _esquema(version=None):
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("Año", pa.int16()),
+            ("Mes_Num", pa.int8()),
+            ("Mes", pa.dictionary(pa.int8(), pa.string())),
+            ("Jarrón", pa.dictionary(pa.int16(), pa.string())),
+            ("Subcategoría", pa.dictionary(pa.int16(), pa.string())),
+            ("Centavos", pa.int64()),
+        ],
+        metadata=None if version is None else {"version": str(version)},
+    )
+
+
+def ruta_columnar(historial):
+    """Arrow file holding the snapshot of `historial`, next to its database."""
+    return os.path.splitext(historial.ruta)[0] + ".arrow"
+
+
+def _lock_para(ruta):
+    with _lock_registro:
+        return _locks.setdefault(ruta, threading.Lock())
+
+
+def _version_archivo(ruta):
+    import pyarrow as pa
+
+    try:
+        with pa.memory_map(ruta) as fuente:
+            metadata = pa.ipc.open_file(fuente).schema.metadata or {}
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    version = metadata.get(b"version")
+    return int(version) if version is not None else None
+
+
+class _Codificador:
+    """Global dictionary codes for one string column, assigned as values appear."""
+
+    def __init__(self):
+        self.indice = {}
+
+    def codificar(self, valores, dtype):
+        import pandas as pd
+
+        # Hash each block in C, then map its few distinct values to global codes
+        locales, unicos = pd.factorize(np.asarray(valores, dtype=object), sort=False)
+        globales = np.fromiter(
+            (self.indice.setdefault(valor, len(self.indice)) for valor in unicos), dtype=dtype, count=len(unicos)
+        )
+        return globales[locales]
+
+    @property
+    def valores(self):
+        return list(self.indice)
+
+
+def escribir_columnar(historial, ruta=None):
+    """Write the store's rows to an Arrow snapshot; returns the store version it reflects.
+
+    Rows are streamed from the store in batches and only their compact codes
+    are kept, so the strings of the history are never held in memory at once.
+    """
+    import pyarrow as pa
+
+    ruta = ruta or ruta_columnar(historial)
+    # Read before the rows: a write that lands meanwhile leaves the snapshot
+    # tagged with an older version, which only causes an extra rebuild.
+    version = historial.version()
+    codificadores = {columna: _Codificador() for columna in ("Mes", "Jarrón", "Subcategoría")}
+    partes = {columna: [] for columna in ("Año", "Mes", "Jarrón", "Subcategoría", "Centavos")}
+    for lote in historial.iterar_filas(tamaño_lote=FILAS_POR_LOTE):
+        años, meses, jarrones, subcategorias, centavos = zip(*lote)
+        partes["Año"].append(np.fromiter(años, dtype=np.int16, count=len(lote)))
+        partes["Mes"].append(codificadores["Mes"].codificar(meses, np.int8))
+        partes["Jarrón"].append(codificadores["Jarrón"].codificar(jarrones, np.int16))
+        partes["Subcategoría"].append(codificadores["Subcategoría"].codificar(subcategorias, np.int16))
+        partes["Centavos"].append(np.fromiter(centavos, dtype=np.int64, count=len(lote)))
+
+    esquema = _esquema(version)
+    diccionarios = {columna: pa.array(c.valores, pa.string()) for columna, c in codificadores.items()}
+    # Month numbers once per distinct month name, then broadcast through the codes
+    numero_mes = np.array([meses_map.get(mes, 0) for mes in codificadores["Mes"].valores], dtype=np.int8)
+    with archivo_atomico(ruta) as f:
+        with pa.ipc.new_file(f, esquema) as escritor:
+            for i in range(len(partes["Año"])):
+                codigos_mes = partes["Mes"][i]
+                escritor.write_batch(pa.record_batch(
+                    [
+                        pa.array(partes["Año"][i]),
+                        pa.array(numero_mes[codigos_mes]),
+                        pa.DictionaryArray.from_arrays(codigos_mes, diccionarios["Mes"]),
+                        pa.DictionaryArray.from_arrays(partes["Jarrón"][i], diccionarios["Jarrón"]),
+                        pa.DictionaryArray.from_arrays(partes["Subcategoría"][i], diccionarios["Subcategoría"]),
+                        pa.array(partes["Centavos"][i]),
+                    ],
+                    schema=esquema,
+                ))
+    return version
+
+
+def actualizar_columnar(historial):
+    """Path of an Arrow snapshot matching the store's current version, rebuilding it if stale."""
+    ruta = ruta_columnar(historial)
+    with _lock_para(ruta):
+        if _version_archivo(ruta) != historial.version():
+            escribir_columnar(historial, ruta)
+    return ruta
+
+
+def cargar_columnas(historial, columnas=None, año_desde=None, año_hasta=None):
+    """DataFrame with only `columnas` (default COLUMNAS_COLUMNAR) of the history.
+
+    Mes, Jarrón and Subcategoría come back as pandas categoricals. The file is
+    memory-mapped, so unselected columns are never read from disk.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columnas = list(columnas or COLUMNAS_COLUMNAR)
+    desconocidas = set(columnas) - set(COLUMNAS_COLUMNAR)
+    if desconocidas:
+        raise ValueError(f"Columnas desconocidas: {', '.join(sorted(desconocidas))}")
+    ruta = actualizar_columnar(historial)
+    with pa.memory_map(ruta) as fuente:
+        # Zero-copy over the mapping: columns are only touched when selected
+        tabla = pa.ipc.open_file(fuente).read_all()
+        if año_desde is not None or año_hasta is not None:
+            años = tabla.column("Año")
+            filtro = pc.and_(
+                pc.greater_equal(años, año_desde if año_desde is not None else np.iinfo(np.int16).min),
+                pc.less_equal(años, año_hasta if año_hasta is not None else np.iinfo(np.int16).max),
+            )
+            tabla = tabla.select(columnas).filter(filtro)
+        else:
+            tabla = tabla.select(columnas)
+        return tabla.to_pandas()
+
+
+def resumir_columnar(historial, claves, año_desde=None, año_hasta=None):
+    """Centavos summed by `claves` (e.g. ["Año", "Jarrón", "Subcategoría"]), reading only those columns."""
+    df = cargar_columnas(historial, [*claves, "Centavos"], año_desde, año_hasta)
+    return df.groupby(list(claves), observed=True, sort=True)["Centavos"].sum().reset_index()
@@ -0,0 +1,625 @@
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from config_jarrones import meses_map
+from dinero import a_pesos
+
+# --- History Storage ---
+# The history used to live in a single CSV that was fully read, filtered and
+# rewritten on every save. Backends now expose a small interface so that
+# re-saving a month only touches that month's rows. Amounts are stored as
+# integer cents; the legacy "Monto asignado" (pesos) column only exists in
+# loaded frames and CSV exports.
+#
+# Each user has its own partition (database file). Writes from every session
+# of the process go through one writer thread that commits whatever saves are
+# queued at that moment in a single transaction; SQLite's file locking keeps
+# writers in other processes out while a transaction is open.
+
+COLUMNAS_HISTORIAL = ["Año", "Mes", "Jarrón", "Subcategoría", "Monto asignado"]
+ARCHIVO_CSV_LEGADO = "historial_desglose_jarrones.csv"
+ARCHIVO_DB = "historial_jarrones.db"
+# The local user keeps ARCHIVO_DB; every other user gets a file in this directory
+USUARIO_LOCAL = "local"
+DIRECTORIO_USUARIOS = os.environ.get("JARRONES_DIRECTORIO_USUARIOS", "historiales")
+# Seconds to wait for another process's write lock before failing
+ESPERA_BLOQUEO = 30
+# Most saves committed together by the writer thread
+MAXIMO_LOTE_ESCRITURA = 64
+# Writes to the in-progress draft: they don't change the history, so they
+# don't bump the version that read caches are keyed on
+ESCRITURAS_BORRADOR = frozenset({"_guardar_borrador"})
+
+
+def ruta_usuario(usuario):
+    """Database file of `usuario`'s history partition."""
+    if usuario in (None, USUARIO_LOCAL):
+        return ARCHIVO_DB
+    # Readable prefix plus a hash, so distinct ids never share a file
+    legible = re.sub(r"[^\w.-]", "_", usuario)[:40]
+    resumen = hashlib.sha256(usuario.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(DIRECTORIO_USUARIOS, f"{legible}-{resumen}.db")
+
+
+@contextmanager
+def archivo_atomico(ruta):
+    """Binary file that replaces `ruta` only once fully written (temp file + fsync + rename).
+
+    Readers see the old or the new file, never a partial one.
+    """
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    temporal = os.path.join(directorio, f".{os.path.basename(ruta)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temporal, "wb") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def escribir_atomico(ruta, datos):
+    """Write bytes to `ruta` atomically (see archivo_atomico)."""
+    with archivo_atomico(ruta) as f:
+        f.write(datos)
+
+
+class _Escritura:
+    __slots__ = ("historial", "operacion", "args", "futuro")
+
+    def __init__(self, historial, operacion, args):
+        self.historial = historial
+        self.operacion = operacion
+        self.args = args
+        self.futuro = Future()
+
+
+class ColaEscritura:
+    """Single writer thread shared by every store of the process.
+
+    Callers block until their write is committed. Writes queued while a
+    transaction is in progress are committed together in the next one, grouped
+    by store, so concurrent saves share one fsync instead of each paying for it.
+    """
+
+    def __init__(self, maximo_lote=MAXIMO_LOTE_ESCRITURA):
+        self.maximo_lote = maximo_lote
+        self._cola = queue.SimpleQueue()
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def escribir(self, historial, operacion, *args):
+        """Queue `historial.<operacion>(*args)` and wait until it is committed."""
+        escritura = _Escritura(historial, operacion, args)
+        self._iniciar()
+        self._cola.put(escritura)
+        return escritura.futuro.result()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._ejecutar, name="historial-escritor", daemon=True)
+                self._hilo.start()
+
+    def _ejecutar(self):
+        while True:
+            lote = [self._cola.get()]
+            while len(lote) < self.maximo_lote:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            por_store = {}
+            for escritura in lote:
+                por_store.setdefault(id(escritura.historial), []).append(escritura)
+            for escrituras in por_store.values():
+                escrituras[0].historial._aplicar_lote(escrituras)
+
+
+_COLA_ESCRITURA = ColaEscritura()
+
+
+
+class HistorialStore(ABC):
+    """Interface shared by every history backend.
+
+    Backends must implement every abstract method (instantiating one that does
+    not raises TypeError) and expose `ruta`, the path that caches and the
+    columnar snapshot are keyed on.
+    """
+
+    @abstractmethod
+    def guardar_mes(self, año, mes, filas):
+        """Replace all rows of (año, mes) with `filas`.
+
+        Each row is a dict with "Jarrón", "Subcategoría" and "Centavos" (int).
+        """
+
+    def cargar(self):
+        """Return the full history as a DataFrame with COLUMNAS_HISTORIAL.
+
+        Read from the columnar snapshot (see historial_columnar): Mes, Jarrón and
+        Subcategoría are categoricals instead of per-row strings.
+        """
+        from historial_columnar import cargar_columnas
+
+        df = cargar_columnas(self, ["Año", "Mes", "Jarrón", "Subcategoría", "Centavos"])
+        df["Centavos"] = a_pesos(df["Centavos"])
+        return df.rename(columns={"Centavos": "Monto asignado"})
+
+    @abstractmethod
+    def borrar_todo(self):
+        """Delete every stored row and the in-progress month draft."""
+
+    @abstractmethod
+    def esta_vacio(self):
+        """True when no rows are stored."""
+
+    @abstractmethod
+    def resumen_mensual(self):
+        """Per-month jar totals: Año, Mes_Num, Mes, Jarrón, Centavos (int64)."""
+
+    @abstractmethod
+    def resumen_anual(self):
+        """Per-year jar totals: Año, Jarrón, Centavos (int64)."""
+
+    @abstractmethod
+    def reconstruir_resumenes(self):
+        """Regenerate the summary tables from the raw rows."""
+
+    @abstractmethod
+    def version(self):
+        """Counter bumped by every write; used as a cache key by readers."""
+
+    @abstractmethod
+    def verificar_resumenes(self):
+        """Return a list of differences between the summaries and the raw rows."""
+
+    @abstractmethod
+    def años(self):
+        """Sorted list of years with stored rows."""
+
+    @abstractmethod
+    def iterar_filas(self, tamaño_lote=50_000, año_desde=None, año_hasta=None):
+        """Yield lists of (año, mes, jarrón, subcategoría, centavos) tuples.
+
+        Rows come in insertion order, `tamaño_lote` at a time, so exports can
+        stream the history without materializing it.
+        """
+
+    @abstractmethod
+    def guardar_borrador(self, secuencia, contexto, filas, sin_guardar=0):
+        """Replace the in-progress month draft (see diario_gastos).
+
+        `filas` are (id, jarrón, subcategoría, centavos) with the expenses' ids
+        increasing in session order,
+        `contexto` a JSON-serializable dict, `secuencia` the last journal
+        record the draft includes and `sin_guardar` the number of expense
+        changes made since the month was last saved to the history.
+        """
+
+    @abstractmethod
+    def cargar_borrador(self):
+        """(secuencia, contexto, filas, sin_guardar) of the saved draft; (0, {}, [], 0) when there is none."""
+
+    def importar_csv(self, ruta):
+        """Load a legacy CSV into the store, replacing the months it contains."""
+        import pandas as pd
+
+        df = pd.read_csv(ruta)
+        if df.empty:
+            return 0
+        df["Centavos"] = (pd.to_numeric(df["Monto asignado"], errors="coerce").fillna(0) * 100).round().astype("int64")
+        for (año, mes), df_mes in df.groupby(["Año", "Mes"], sort=False):
+            self.guardar_mes(int(año), mes, df_mes.to_dict("records"))
+        return len(df)
+
+    def exportar_csv(self):
+        """Return the full history encoded as CSV bytes (legacy schema)."""
+        return self.cargar().to_csv(index=False).encode("utf-8")
+
+
+class SQLiteHistorialStore(HistorialStore):
+    """History stored in SQLite with an index on (año, mes).
+
+    The connection is shared by the app's threads and the writer thread, so
+    every use of it holds `_lock`. WAL mode lets readers in other connections
+    (exports, other processes) proceed while a write is committing.
+    """
+
+    def __init__(self, ruta=ARCHIVO_DB, csv_legado=ARCHIVO_CSV_LEGADO, cola=None):
+        self.ruta = ruta
+        self._cola = cola or _COLA_ESCRITURA
+        self._lock = threading.RLock()
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, timeout=ESPERA_BLOQUEO)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # fsync on every commit: a crash never loses or truncates a committed month
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._crear_esquema()
+        if csv_legado:
+            self._migrar_csv_legado(csv_legado)
+
+    @classmethod
+    def para_usuario(cls, usuario, **kwargs):
+        """Store of one user's partition; only the local user imports the legacy CSV."""
+        if usuario not in (None, USUARIO_LOCAL):
+            kwargs.setdefault("csv_legado", None)
+        return cls(ruta_usuario(usuario), **kwargs)
+
+    def _crear_esquema(self):
+        self._renombrar_esquema_real()
+        with self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS historial (
+                    anio INTEGER NOT NULL,
+                    mes TEXT NOT NULL,
+                    jarron TEXT NOT NULL,
+                    subcategoria TEXT NOT NULL,
+                    centavos INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_historial_periodo ON historial (anio, mes);
+                CREATE TABLE IF NOT EXISTS meta (
+                    clave TEXT PRIMARY KEY,
+                    valor TEXT
+                );
+                CREATE TABLE IF NOT EXISTS resumen_mensual (
+                    anio INTEGER NOT NULL,
+                    mes_num INTEGER NOT NULL,
+                    mes TEXT NOT NULL,
+                    jarron TEXT NOT NULL,
+                    centavos INTEGER NOT NULL,
+                    PRIMARY KEY (anio, mes, jarron)
+                );
+                CREATE TABLE IF NOT EXISTS resumen_anual (
+                    anio INTEGER NOT NULL,
+                    jarron TEXT NOT NULL,
+                    centavos INTEGER NOT NULL,
+                    PRIMARY KEY (anio, jarron)
+                );
+                CREATE TABLE IF NOT EXISTS borrador (
+                    posicion INTEGER PRIMARY KEY, -- the expense's id in the session
+                    jarron TEXT NOT NULL,
+                    subcategoria TEXT NOT NULL,
+                    centavos INTEGER NOT NULL
+                );
+                """
+            )
+        # Checked on every open, not only right after the rename: the rename, the
+        # CREATE above and this copy commit separately, and a crash in between
+        # must not leave the rows stranded in historial_real
+        migracion_pendiente = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'historial_real'"
+        ).fetchone()
+        if migracion_pendiente:
+            # Copy and drop commit together, so the copy is never done twice
+            with self._conn:
+                self._conn.execute(
+                    """
+                    INSERT INTO historial (anio, mes, jarron, subcategoria, centavos)
+                    SELECT anio, mes, jarron, subcategoria, CAST(ROUND(monto * 100) AS INTEGER)
+                    FROM historial_real ORDER BY rowid
+                    """
+                )
+                self._conn.execute("DROP TABLE historial_real")
+        # Databases created before the summary tables existed get them filled once
+        tiene_resumenes = self._conn.execute(
+            "SELECT 1 FROM meta WHERE clave = 'resumenes'"
+        ).fetchone()
+        if not tiene_resumenes:
+            self.reconstruir_resumenes()
+
+    def _renombrar_esquema_real(self):
+        # Databases written before amounts were stored in cents keep a REAL
+        # "monto" column: move it aside so it can be copied into the new table,
+        # and drop the summaries so they are rebuilt in cents.
+        columnas = [fila[1] for fila in self._conn.execute("PRAGMA table_info(historial)")]
+        if "monto" not in columnas:
+            return
+        with self._conn:
+            self._conn.execute("DROP INDEX IF EXISTS ix_historial_periodo")
+            self._conn.execute("ALTER TABLE historial RENAME TO historial_real")
+            self._conn.execute("DROP TABLE IF EXISTS resumen_mensual")
+            self._conn.execute("DROP TABLE IF EXISTS resumen_anual")
+            self._conn.execute("DELETE FROM meta WHERE clave = 'resumenes'")
+
+    def _migrar_csv_legado(self, ruta):
+        # One-time import of the old CSV history; the flag survives "Borrar TODO"
+        # so cleared data is not resurrected on the next start.
+        ya_migrado = self._conn.execute(
+            "SELECT 1 FROM meta WHERE clave = 'csv_migrado'"
+        ).fetchone()
+        if ya_migrado or not os.path.exists(ruta):
+            return
+        import pandas as pd
+
+        try:
+            self.importar_csv(ruta)
+        except pd.errors.EmptyDataError:
+            pass
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (clave, valor) VALUES ('csv_migrado', ?)", (ruta,)
+            )
+
+    def guardar_mes(self, año, mes, filas):
+        registros = [
+            (int(año), mes, fila["Jarrón"], fila["Subcategoría"], int(fila["Centavos"]))
+            for fila in filas
+        ]
+        self._cola.escribir(self, "_guardar_mes", int(año), mes, registros)
+
+    def _aplicar_lote(self, escrituras):
+        # Called from the writer thread: all queued writes of this store in one
+        # transaction. If it fails, each write is retried alone so only the
+        # offending caller gets the error.
+        try:
+            with self._lock, self._conn:
+                # Take the write lock up front instead of upgrading mid-transaction
+                self._conn.execute("BEGIN IMMEDIATE")
+                for escritura in escrituras:
+                    getattr(self, escritura.operacion)(*escritura.args)
+                if any(escritura.operacion not in ESCRITURAS_BORRADOR for escritura in escrituras):
+                    self._incrementar_version()
+        except Exception as error:
+            if len(escrituras) == 1:
+                escrituras[0].futuro.set_exception(error)
+            else:
+                for escritura in escrituras:
+                    self._aplicar_lote([escritura])
+            return
+        for escritura in escrituras:
+            escritura.futuro.set_result(None)
+
+    def _guardar_mes(self, año, mes, registros):
+        # Delete and insert inside the batch transaction so readers never see a half-saved month
+        totales_mes = {}
+        for _, _, jarron, _, centavos in registros:
+            totales_mes[jarron] = totales_mes.get(jarron, 0) + centavos
+        self._conn.execute("DELETE FROM historial WHERE anio = ? AND mes = ?", (año, mes))
+        self._conn.executemany(
+            "INSERT INTO historial (anio, mes, jarron, subcategoria, centavos) VALUES (?, ?, ?, ?, ?)",
+            registros,
+        )
+        self._actualizar_resumenes(año, mes, totales_mes)
+
+    def _actualizar_resumenes(self, año, mes, totales_mes):
+        # Only the saved month and its year are touched; the annual row is
+        # re-derived from at most twelve monthly rows.
+        self._conn.execute("DELETE FROM resumen_mensual WHERE anio = ? AND mes = ?", (año, mes))
+        self._conn.executemany(
+            "INSERT INTO resumen_mensual (anio, mes_num, mes, jarron, centavos) VALUES (?, ?, ?, ?, ?)",
+            [(año, meses_map.get(mes, 0), mes, jarron, centavos) for jarron, centavos in totales_mes.items()],
+        )
+        self._conn.execute("DELETE FROM resumen_anual WHERE anio = ?", (año,))
+        self._conn.execute(
+            """
+            INSERT INTO resumen_anual (anio, jarron, centavos)
+            SELECT anio, jarron, SUM(centavos) FROM resumen_mensual WHERE anio = ? GROUP BY anio, jarron
+            """,
+            (año,),
+        )
+
+    def _incrementar_version(self):
+        # Runs inside the caller's transaction so the bump commits with the data
+        self._conn.execute(
+            """
+            INSERT INTO meta (clave, valor) VALUES ('version', '1')
+            ON CONFLICT (clave) DO UPDATE SET valor = CAST(valor AS INTEGER) + 1
+            """
+        )
+
+    def version(self):
+        with self._lock:
+            fila = self._conn.execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()
+        return int(fila[0]) if fila else 0
+
+    def resumen_mensual(self):
+        import pandas as pd
+
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT anio, mes_num, mes, jarron, centavos FROM resumen_mensual ORDER BY anio, mes_num"
+            ).fetchall()
+        df = pd.DataFrame(filas, columns=["Año", "Mes_Num", "Mes", "Jarrón", "Centavos"])
+        return df.astype({"Centavos": "int64"})
+
+    def resumen_anual(self):
+        import pandas as pd
+
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT anio, jarron, centavos FROM resumen_anual ORDER BY anio"
+            ).fetchall()
+        df = pd.DataFrame(filas, columns=["Año", "Jarrón", "Centavos"])
+        return df.astype({"Centavos": "int64"})
+
+    def _resumen_desde_filas(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT anio, mes, jarron, SUM(centavos) FROM historial GROUP BY anio, mes, jarron"
+            ).fetchall()
+
+    def reconstruir_resumenes(self):
+        totales = {}
+        for año, mes, jarron, centavos in self._resumen_desde_filas():
+            totales.setdefault((año, mes), {})[jarron] = centavos
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM resumen_mensual")
+            self._conn.execute("DELETE FROM resumen_anual")
+            for (año, mes), totales_mes in totales.items():
+                self._actualizar_resumenes(año, mes, totales_mes)
+            self._conn.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('resumenes', '1')")
+            self._incrementar_version()
+        return len(totales)
+
+    def verificar_resumenes(self):
+        # Amounts are integer cents, so the comparison is exact
+        diferencias = []
+        esperado = {(a, m, j): c for a, m, j, c in self._resumen_desde_filas()}
+        with self._lock:
+            actual = {
+                (a, m, j): c
+                for a, m, j, c in self._conn.execute("SELECT anio, mes, jarron, centavos FROM resumen_mensual")
+            }
+            actual_anual = {
+                (a, j): c for a, j, c in self._conn.execute("SELECT anio, jarron, centavos FROM resumen_anual")
+            }
+        for clave in sorted(set(esperado) | set(actual), key=str):
+            if esperado.get(clave, 0) != actual.get(clave, 0):
+                diferencias.append(("mensual", clave, esperado.get(clave), actual.get(clave)))
+        esperado_anual = {}
+        for (a, _, j), c in esperado.items():
+            esperado_anual[(a, j)] = esperado_anual.get((a, j), 0) + c
+        for clave in sorted(set(esperado_anual) | set(actual_anual), key=str):
+            if esperado_anual.get(clave, 0) != actual_anual.get(clave, 0):
+                diferencias.append(("anual", clave, esperado_anual.get(clave), actual_anual.get(clave)))
+        return diferencias
+
+    def borrar_todo(self):
+        self._cola.escribir(self, "_borrar_todo")
+        # The columnar snapshot would be rebuilt empty on next read; don't keep the old rows until then
+        try:
+            os.remove(os.path.splitext(self.ruta)[0] + ".arrow")
+        except FileNotFoundError:
+            pass
+
+    def _borrar_todo(self):
+        self._conn.execute("DELETE FROM historial")
+        self._conn.execute("DELETE FROM resumen_mensual")
+        self._conn.execute("DELETE FROM resumen_anual")
+        # The in-progress month goes too, or the next session would restore it
+        self._conn.execute("DELETE FROM borrador")
+        self._conn.execute("DELETE FROM meta WHERE clave = 'borrador'")
+
+    def guardar_borrador(self, secuencia, contexto, filas, sin_guardar=0):
+        registros = [(int(id), jarron, sub, int(centavos)) for id, jarron, sub, centavos in filas]
+        self._cola.escribir(self, "_guardar_borrador", int(secuencia), contexto, registros, int(sin_guardar))
+
+    def _guardar_borrador(self, secuencia, contexto, registros, sin_guardar):
+        self._conn.execute("DELETE FROM borrador")
+        self._conn.executemany(
+            "INSERT INTO borrador (posicion, jarron, subcategoria, centavos) VALUES (?, ?, ?, ?)", registros
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (clave, valor) VALUES ('borrador', ?)",
+            (json.dumps({"secuencia": secuencia, "contexto": contexto, "sin_guardar": sin_guardar}, ensure_ascii=False),),
+        )
+
+    def cargar_borrador(self):
+        with self._lock:
+            fila = self._conn.execute("SELECT valor FROM meta WHERE clave = 'borrador'").fetchone()
+            filas = self._conn.execute(
+                "SELECT posicion, jarron, subcategoria, centavos FROM borrador ORDER BY posicion"
+            ).fetchall()
+        if fila is None:
+            return 0, {}, filas, 0
+        estado = json.loads(fila[0])
+        # Drafts written before saves were tracked count as fully unsaved
+        return estado["secuencia"], estado["contexto"], filas, estado.get("sin_guardar", len(filas))
+
+    def esta_vacio(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM historial LIMIT 1").fetchone() is None
+
+    def años(self):
+        # The annual summary has a few rows per year, so this runs on every rerun
+        # without scanning the history; it holds a year exactly when historial does
+        with self._lock:
+            return [fila[0] for fila in self._conn.execute("SELECT DISTINCT anio FROM resumen_anual ORDER BY anio")]
+
+    def iterar_filas(self, tamaño_lote=50_000, año_desde=None, año_hasta=None):
+        # A separate read connection: exports may run on another thread while
+        # the app keeps using the main one.
+        conn = sqlite3.connect(self.ruta, timeout=ESPERA_BLOQUEO)
+        try:
+            cursor = conn.execute(
+                """
+                SELECT anio, mes, jarron, subcategoria, centavos FROM historial
+                WHERE anio >= ? AND anio <= ? ORDER BY rowid
+                """,
+                (año_desde if año_desde is not None else -1, año_hasta if año_hasta is not None else 10**6),
+            )
+            while True:
+                lote = cursor.fetchmany(tamaño_lote)
+                if not lote:
+                    break
+                yield lote
+        finally:
+            conn.close()
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Registry of available backends, selectable with JARRONES_HISTORIAL_BACKEND
+BACKENDS = {
+    "sqlite": SQLiteHistorialStore,
+}
+
+
+def abrir_historial(backend=None, usuario=USUARIO_LOCAL, **kwargs):
+    """Open `usuario`'s history partition in the configured backend (SQLite by default)."""
+    nombre = backend or os.environ.get("JARRONES_HISTORIAL_BACKEND", "sqlite")
+    try:
+        clase = BACKENDS[nombre]
+    except KeyError:
+        raise ValueError(f"Backend de historial desconocido: {nombre!r}") from None
+    return clase.para_usuario(usuario, **kwargs)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Herramientas del historial de jarrones")
+    destino = parser.add_mutually_exclusive_group()
+    destino.add_argument("--db", help="Ruta de la base de datos del historial")
+    destino.add_argument("--usuario", help=f"Historial de este usuario (default: {USUARIO_LOCAL})")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_imp = sub.add_parser("importar", help="Importar un CSV con el esquema del historial")
+    p_imp.add_argument("csv")
+    p_exp = sub.add_parser("exportar", help="Exportar el historial completo a CSV")
+    p_exp.add_argument("csv")
+    sub.add_parser("verificar", help="Comparar los resúmenes con las filas del historial")
+    sub.add_parser("reconstruir", help="Regenerar los resúmenes desde las filas del historial")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        historial = SQLiteHistorialStore(args.db, csv_legado=None)
+    else:
+        historial = SQLiteHistorialStore.para_usuario(args.usuario or USUARIO_LOCAL, csv_legado=None)
+    if args.comando == "importar":
+        print(f"{historial.importar_csv(args.csv)} filas importadas desde {args.csv}")
+    elif args.comando == "exportar":
+        escribir_atomico(args.csv, historial.exportar_csv())
+        print(f"Historial exportado a {args.csv}")
+    elif args.comando == "verificar":
+        diferencias = historial.verificar_resumenes()
+        for tipo, clave, esperado, actual in diferencias:
+            print(f"[{tipo}] {clave}: esperado={esperado} actual={actual}")
+        print("Resúmenes consistentes." if not diferencias else f"{len(diferencias)} diferencias encontradas.")
+        historial.cerrar()
+        return 1 if diferencias else 0
+    elif args.comando == "reconstruir":
+        print(f"Resúmenes reconstruidos para {historial.reconstruir_resumenes()} meses.")
+    historial.cerrar()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
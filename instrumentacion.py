@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+# --- Rerun Instrumentation ---
+# Times the named sections of one script run (validation, jar loop, totals,
+# save, summaries, charts, exports) together with the rows each one handled.
+# Every finished run is appended as one JSON line to a rotating log; work that
+# happens outside a run (deferred downloads) is logged as a standalone event.
+# Fragment reruns (a single jar) are measured like a run and tagged with an
+# "evento" name, since they never reach the end of the script.
+# An optional cProfile/pyinstrument capture can wrap a single run.
+
+# Empty JARRONES_LOG_RENDIMIENTO disables the log
+RUTA_LOG = os.environ.get("JARRONES_LOG_RENDIMIENTO", "rendimiento_jarrones.jsonl")
+TAMAÑO_MAXIMO_LOG = 5 * 2**20
+RESPALDOS_LOG = 3
+DIRECTORIO_PERFILES = os.environ.get("JARRONES_DIRECTORIO_PERFILES", "perfiles")
+HERRAMIENTAS_PERFIL = ("cprofile", "pyinstrument")
+
+_registro = logging.getLogger("jarrones.rendimiento")
+
+
+def _configurar_registro():
+    # Streamlit re-executes the script, not this module: the handler is added once per process
+    if _registro.handlers or not RUTA_LOG:
+        return
+    handler = RotatingFileHandler(RUTA_LOG, maxBytes=TAMAÑO_MAXIMO_LOG, backupCount=RESPALDOS_LOG, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    _registro.addHandler(handler)
+    _registro.setLevel(logging.INFO)
+    _registro.propagate = False
+
+
+def registrar(evento):
+    """Append one event (a JSON-serializable dict) to the rotating log."""
+    _configurar_registro()
+    if _registro.handlers:
+        _registro.info(json.dumps(evento, ensure_ascii=False))
+
+
+def cronometrado(nombre, funcion, *args):
+    """Call funcion(*args), log its duration as a standalone event and return its result."""
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    evento = {"fecha": datetime.now().isoformat(timespec="seconds"), "evento": nombre,
+              "segundos": round(time.perf_counter() - inicio, 6)}
+    if isinstance(resultado, bytes):
+        evento["bytes"] = len(resultado)
+    registrar(evento)
+    return resultado
+
+
+class MedicionRerun:
+    """Section timings of one script run (or fragment rerun named by `evento`), in execution order."""
+
+    def __init__(self, evento=None):
+        self.evento = evento
+        self.fecha = datetime.now().isoformat(timespec="seconds")
+        self.secciones = []
+        self.total = None
+        self.perfil = None
+        self._inicio = time.perf_counter()
+        self._abiertas = {}
+
+    @contextmanager
+    def seccion(self, nombre, filas=None):
+        """Time the enclosed block; set registro["filas"] inside it to record a row count."""
+        registro = {"seccion": nombre, "segundos": None, "filas": filas}
+        self.secciones.append(registro)
+        self._abiertas[id(registro)] = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            inicio = self._abiertas.pop(id(registro), None)
+            if inicio is not None:
+                registro["segundos"] = round(time.perf_counter() - inicio, 6)
+
+    @property
+    def cerrada(self):
+        return self.total is not None
+
+    def cerrar(self):
+        """Finish the run (idempotent) and log it; sections still open are closed as interrupted."""
+        if self.cerrada:
+            return
+        ahora = time.perf_counter()
+        for registro in self.secciones:
+            inicio = self._abiertas.pop(id(registro), None)
+            if inicio is not None:
+                # st.stop()/st.rerun() ended the run inside this section
+                registro["segundos"] = round(ahora - inicio, 6)
+                registro["interrumpida"] = True
+        self.total = round(ahora - self._inicio, 6)
+        registrar(self.como_dict())
+
+    def como_dict(self):
+        datos = {"fecha": self.fecha, "total": self.total, "secciones": self.secciones, "perfil": self.perfil}
+        if self.evento is not None:
+            datos["evento"] = self.evento
+        return datos
+
+
+def iniciar_perfil(herramienta):
+    """Start and return a Perfilador; unknown tool names fall back to cProfile."""
+    perfilador = Perfilador(herramienta if herramienta in HERRAMIENTAS_PERFIL else "cprofile")
+    perfilador.iniciar()
+    return perfilador
+
+
+class Perfilador:
+    """cProfile or pyinstrument capture of one run, saved under DIRECTORIO_PERFILES.
+
+    pyinstrument is optional; when it is not installed cProfile is used instead.
+    """
+
+    def __init__(self, herramienta="cprofile"):
+        if herramienta == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                herramienta = "cprofile"
+            else:
+                self._perfil = Profiler()
+        if herramienta == "cprofile":
+            import cProfile
+
+            self._perfil = cProfile.Profile()
+        self.herramienta = herramienta
+        self.ruta = None
+        self.resumen = None
+
+    def iniciar(self):
+        if self.herramienta == "pyinstrument":
+            self._perfil.start()
+        else:
+            self._perfil.enable()
+
+    def detener(self):
+        """Stop the capture, write it to disk and keep a text summary; returns the file path."""
+        os.makedirs(DIRECTORIO_PERFILES, exist_ok=True)
+        nombre = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        if self.herramienta == "pyinstrument":
+            self._perfil.stop()
+            self.ruta = os.path.join(DIRECTORIO_PERFILES, f"{nombre}.html")
+            with open(self.ruta, "w", encoding="utf-8") as f:
+                f.write(self._perfil.output_html())
+            self.resumen = self._perfil.output_text()
+        else:
+            import io
+            import pstats
+
+            self._perfil.disable()
+            self.ruta = os.path.join(DIRECTORIO_PERFILES, f"{nombre}.prof")
+            self._perfil.dump_stats(self.ruta)
+            salida = io.StringIO()
+            pstats.Stats(self._perfil, stream=salida).sort_stats("cumulative").print_stats(25)
+            self.resumen = salida.getvalue()
+        return self.ruta
@@ -0,0 +1,245 @@
+"""Month-end batch allocation for many households, without a browser session.
+
+    python lote_jarrones.py hogares.csv --gastos gastos.csv --salida resultados/ --procesos 8
+
+hogares.csv: Hogar, Año, Mes, Ingreso (one row per household and month).
+gastos.csv (optional): Hogar, Año, Mes, Jarrón, Subcategoría, Monto.
+
+Writes one ``<Hogar>.csv`` per household with the same schema as
+historial_desglose_jarrones.csv (income row plus expenses per month),
+``asignaciones.csv`` with each jar's limit, amount spent, balance and whether
+it was exceeded, and ``resumen_mensual.csv`` / ``resumen_anual.csv`` with
+each household's income, total spent and balance per month and year.
+Allocation and validation are vectorized with NumPy/pandas; large batches are
+split by household across a process pool.
+"""
+import argparse
+import csv
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config_jarrones import meses_map, porcentajes, subcategorias_listas
+from dinero import MAXIMO_CENTAVOS, a_pesos, parse_monto
+from historial_store import COLUMNAS_HISTORIAL
+from motor_jarrones import (
+    JARRON_INGRESO,
+    SUBCATEGORIA_INGRESO,
+    repartir_ingresos,
+    resumen_anual_simplificado,
+    resumen_mensual_simplificado,
+    resumenes_desde_filas,
+    validar_gastos,
+)
+
+CLAVES = ["Hogar", "Año", "Mes"]
+# Report files written next to the per-household histories
+ARCHIVOS_REPORTE = ["asignaciones.csv", "resumen_mensual.csv", "resumen_anual.csv"]
+# Below this many household-months the pool start-up costs more than it saves
+UMBRAL_PARALELO = 20_000
+
+
+def _a_centavos(serie):
+    # Numeric columns convert in one vectorized pass; text goes through the locale-aware parser
+    if pd.api.types.is_numeric_dtype(serie):
+        centavos = (serie.astype("float64") * 100).round()
+        # Same cap as parse_monto: larger values would overflow int64 once allocated
+        if (centavos.abs() > MAXIMO_CENTAVOS).any():
+            raise ValueError(f"Monto demasiado grande: {float(serie[centavos.abs() > MAXIMO_CENTAVOS].iloc[0])}")
+        return centavos.astype("int64")
+    return serie.astype(str).map(parse_monto).astype("int64")
+
+
+def leer_hogares(ruta):
+    df = pd.read_csv(ruta, dtype={"Hogar": str})
+    df["Centavos"] = _a_centavos(df.pop("Ingreso"))
+    return df
+
+
+def leer_gastos(ruta):
+    df = pd.read_csv(ruta, dtype={"Hogar": str})
+    df["Centavos"] = _a_centavos(df.pop("Monto"))
+    desconocidos = set(df["Jarrón"].unique()) - set(porcentajes)
+    if desconocidos:
+        raise ValueError(f"Jarrones desconocidos en {ruta}: {', '.join(sorted(desconocidos))}")
+    validas = pd.MultiIndex.from_tuples(
+        [(jarron, sub) for jarron, subs in subcategorias_listas.items() for sub in subs]
+    )
+    invalidas = ~pd.MultiIndex.from_frame(df[["Jarrón", "Subcategoría"]]).isin(validas)
+    if invalidas.any():
+        pares = df.loc[invalidas, ["Jarrón", "Subcategoría"]].drop_duplicates().itertuples(index=False)
+        raise ValueError(f"Subcategorías desconocidas en {ruta}: {', '.join(f'{j} › {s}' for j, s in pares)}")
+    return df
+
+
+def _rechazar(df, invalidas, mensaje):
+    if invalidas.any():
+        ejemplos = ", ".join(f"{h} {m} {a}" for h, a, m in df.loc[invalidas, CLAVES].head(5).itertuples(index=False))
+        raise ValueError(f"{int(invalidas.sum())} {mensaje} (p. ej. {ejemplos})")
+
+
+def verificar_entrada(df_hogares, df_gastos):
+    """Raise ValueError for input the app would not accept (unknown months, years
+    outside 2000-2100, incomes or expenses <= 0), household-months repeated in
+    hogares.csv, expenses of household-months missing from it and households
+    whose output files would collide."""
+    # Same rules as the app's inputs: anything else would be written to the history
+    for df, archivo, monto in ((df_hogares, "hogares", "ingresos"), (df_gastos, "gastos", "montos")):
+        if df is None or df.empty:
+            continue
+        _rechazar(df, ~df["Mes"].isin(list(meses_map)), f"meses desconocidos en el archivo de {archivo}")
+        _rechazar(df, ~df["Año"].between(2000, 2100), f"años fuera de 2000-2100 en el archivo de {archivo}")
+        _rechazar(df, df["Centavos"] <= 0, f"{monto} menores o iguales a cero en el archivo de {archivo}")
+    repetidos = df_hogares.duplicated(CLAVES)
+    if repetidos.any():
+        # Each repeat would duplicate the month's limits and every expense joined to it
+        ejemplos = ", ".join(
+            f"{h} {m} {a}" for h, a, m in df_hogares.loc[repetidos, CLAVES].drop_duplicates().head(5).itertuples(index=False)
+        )
+        raise ValueError(f"{int(repetidos.sum())} hogar-mes repetidos en el archivo de hogares (p. ej. {ejemplos})")
+    if df_gastos is not None and not df_gastos.empty:
+        meses = pd.MultiIndex.from_frame(df_hogares[CLAVES])
+        sin_hogar = ~pd.MultiIndex.from_frame(df_gastos[CLAVES]).isin(meses)
+        if sin_hogar.any():
+            faltantes = df_gastos.loc[sin_hogar, CLAVES].drop_duplicates()
+            ejemplos = ", ".join(f"{h} {m} {a}" for h, a, m in faltantes.head(5).itertuples(index=False))
+            raise ValueError(
+                f"{len(faltantes)} hogar-mes con gastos no aparecen en el archivo de hogares (p. ej. {ejemplos})"
+            )
+    # Names compared case-insensitively: the output may live on such a filesystem
+    reservados = {nombre.lower() for nombre in ARCHIVOS_REPORTE}
+    por_archivo = {}
+    for hogar in df_hogares["Hogar"].unique():
+        nombre = _nombre_archivo(hogar)
+        if nombre.lower() in reservados:
+            raise ValueError(f"El hogar {hogar!r} se escribiría en {nombre}, reservado para el reporte")
+        previo = por_archivo.setdefault(nombre.lower(), hogar)
+        if previo != hogar:
+            raise ValueError(f"Los hogares {previo!r} y {hogar!r} se escribirían en el mismo archivo {nombre}")
+
+
+def asignar(df_hogares):
+    """Jar limits for every household-month: CLAVES + Jarrón + Límite (cents)."""
+    jarrones = list(porcentajes)
+    matriz = repartir_ingresos(df_hogares["Centavos"].to_numpy())
+    df = df_hogares.loc[df_hogares.index.repeat(len(jarrones)), CLAVES].reset_index(drop=True)
+    df["Jarrón"] = np.tile(jarrones, len(df_hogares))
+    df["Límite"] = matriz.ravel()
+    return df
+
+
+def filas_historial_lote(df_hogares, df_gastos):
+    """History rows (CLAVES + Jarrón, Subcategoría, Centavos): income row first in each month."""
+    ingresos = df_hogares[CLAVES + ["Centavos"]].assign(
+        **{"Jarrón": JARRON_INGRESO, "Subcategoría": SUBCATEGORIA_INGRESO, "_orden": 0}
+    )
+    ingresos["_mes"] = np.arange(len(ingresos))
+    partes = [ingresos]
+    if df_gastos is not None and not df_gastos.empty:
+        posicion = ingresos.set_index(CLAVES)["_mes"]
+        gastos = df_gastos.join(posicion, on=CLAVES).dropna(subset=["_mes"]).assign(_orden=1)
+        partes.append(gastos)
+    filas = pd.concat(partes, ignore_index=True)
+    # Households contiguous, months in input order, income before expenses
+    filas = filas.sort_values(["Hogar", "_mes", "_orden"], kind="stable")
+    return filas[CLAVES + ["Jarrón", "Subcategoría", "Centavos"]]
+
+
+def _nombre_archivo(hogar):
+    return re.sub(r"[^\w.-]", "_", str(hogar)) + ".csv"
+
+
+def procesar_bloque(df_hogares, df_gastos, directorio):
+    """Allocate, validate and write the history files of one block of households.
+
+    Returns (validation table, monthly totals, annual totals), the totals in the
+    long format of resumenes_desde_filas with a leading Hogar column.
+    """
+    asignaciones = asignar(df_hogares)
+    gastos = df_gastos if df_gastos is not None else pd.DataFrame(columns=CLAVES + ["Jarrón", "Centavos"])
+    resultado = validar_gastos(asignaciones, gastos.astype({"Centavos": "int64"}), CLAVES)
+
+    filas = filas_historial_lote(df_hogares, df_gastos)
+    mensual, anual = resumenes_desde_filas(filas, por=["Hogar"])
+    filas["Monto asignado"] = a_pesos(filas.pop("Centavos"))
+    # One pass over plain tuples: per-file DataFrame.to_csv calls dominate otherwise
+    hogares = filas["Hogar"].to_numpy()
+    registros = list(filas[COLUMNAS_HISTORIAL].itertuples(index=False, name=None))
+    cortes = np.flatnonzero(hogares[1:] != hogares[:-1]) + 1
+    for inicio, fin in zip(np.r_[0, cortes], np.r_[cortes, len(registros)]):
+        with open(os.path.join(directorio, _nombre_archivo(hogares[inicio])), "w", newline="", encoding="utf-8") as f:
+            escritor = csv.writer(f, lineterminator="\n")
+            escritor.writerow(COLUMNAS_HISTORIAL)
+            escritor.writerows(registros[inicio:fin])
+    return resultado, mensual, anual
+
+
+def _bloques(df_hogares, df_gastos, procesos):
+    hogares = df_hogares["Hogar"].unique()
+    for grupo in np.array_split(hogares, procesos * 4):
+        if len(grupo) == 0:
+            continue
+        en_grupo = df_hogares["Hogar"].isin(grupo)
+        gastos = df_gastos[df_gastos["Hogar"].isin(grupo)] if df_gastos is not None else None
+        yield df_hogares[en_grupo], gastos
+
+
+def procesar_lote(df_hogares, df_gastos, directorio, procesos=None):
+    """Process the whole batch; returns (validation table, monthly totals, annual totals).
+
+    Blocks hold whole households, so their tables are simply concatenated. The
+    input is expected to have passed verificar_entrada.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1 or len(df_hogares) < UMBRAL_PARALELO:
+        return procesar_bloque(df_hogares, df_gastos, directorio)
+    bloques = list(_bloques(df_hogares, df_gastos, procesos))
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        resultados = list(pool.map(
+            procesar_bloque,
+            [h for h, _ in bloques], [g for _, g in bloques], [directorio] * len(bloques),
+        ))
+    return tuple(pd.concat(tablas, ignore_index=True) for tablas in zip(*resultados))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Asignación por lotes de los 6 jarrones")
+    parser.add_argument("hogares", help="CSV con Hogar, Año, Mes, Ingreso")
+    parser.add_argument("--gastos", help="CSV con Hogar, Año, Mes, Jarrón, Subcategoría, Monto")
+    parser.add_argument("--salida", default="resultados_lote", help="Directorio de salida")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo (default: CPUs)")
+    args = parser.parse_args(argv)
+
+    try:
+        df_hogares = leer_hogares(args.hogares)
+        df_gastos = leer_gastos(args.gastos) if args.gastos else None
+        verificar_entrada(df_hogares, df_gastos)
+    except (ValueError, KeyError) as e:
+        print(f"Error en los archivos de entrada: {e}")
+        return 2
+
+    resultado, mensual, anual = procesar_lote(df_hogares, df_gastos, args.salida, args.procesos)
+    for col in ["Límite", "Gastado", "Disponible"]:
+        resultado[col] = a_pesos(resultado[col])
+    resultado.to_csv(os.path.join(args.salida, "asignaciones.csv"), index=False)
+    jarrones = list(porcentajes)
+    resumen_mensual_simplificado(mensual, jarrones, por=["Hogar"]).to_csv(
+        os.path.join(args.salida, "resumen_mensual.csv"), index=False
+    )
+    resumen_anual_simplificado(anual, jarrones, por=["Hogar"]).to_csv(
+        os.path.join(args.salida, "resumen_anual.csv"), index=False
+    )
+
+    excedidos = resultado.loc[resultado["Excedido"], CLAVES].drop_duplicates()
+    print(f"{df_hogares['Hogar'].nunique()} hogares, {len(df_hogares)} meses procesados en {args.salida}")
+    if len(excedidos):
+        print(f"{len(excedidos)} meses con al menos un jarrón excedido (ver asignaciones.csv)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
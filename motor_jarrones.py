@@ -0,0 +1,128 @@
+import numpy as np
+
+from config_jarrones import JARRON_RESIDUO, meses_map, porcentajes
+from dinero import repartir
+# Summary tables are part of the engine's public surface
+from resumenes import JARRON_INGRESO, resumen_anual_simplificado, resumen_mensual_simplificado  # noqa: F401
+
+# --- Allocation Engine ---
+# The jar logic without any Streamlit dependency: splitting income by
+# `porcentajes`, checking expenses against jar limits and building the
+# history rows and summaries. Used by app6.py and by the batch CLI
+# (lote_jarrones.py). All amounts are integer cents.
+
+SUBCATEGORIA_INGRESO = "Total Ingreso"
+
+
+def repartir_ingreso(ingreso, porcentajes=porcentajes, jarron_residuo=JARRON_RESIDUO):
+    """Exact split of one income (cents) into {jarrón: cents}."""
+    return repartir(ingreso, porcentajes, jarron_residuo)
+
+
+def repartir_ingresos(ingresos, porcentajes=porcentajes, jarron_residuo=JARRON_RESIDUO):
+    """Vectorized `repartir_ingreso` for an array of incomes.
+
+    Returns an (n, len(porcentajes)) int64 matrix whose columns follow the
+    order of `porcentajes`; every row adds up exactly to its income.
+    """
+    ingresos = np.asarray(ingresos, dtype=np.int64)
+    jarrones = list(porcentajes)
+    puntos = np.array([int(round(porcentajes[j] * 10000)) for j in jarrones], dtype=np.int64)
+    if puntos.sum() != 10000:
+        raise ValueError("Los porcentajes de los jarrones deben sumar 100%")
+    partes = ingresos[:, None] * puntos[None, :] // 10000
+    partes[:, jarrones.index(jarron_residuo)] += ingresos - partes.sum(axis=1)
+    return partes
+
+
+def excedente(asignado, monto, limite):
+    """Cents by which adding `monto` to `asignado` would exceed `limite` (<= 0 means it fits)."""
+    return asignado + monto - limite
+
+
+def admitir_en_orden(jarrones, montos, asignado, limites):
+    """Which of a batch of expenses fit their jar's limit, taken in order.
+
+    `jarrones` and `montos` (cents) describe the batch; `asignado` and
+    `limites` map each jar to what it already holds and its limit. The result
+    (a boolean array aligned with the batch) is the same as adding the
+    expenses one by one: one that would exceed its jar is skipped and the
+    following ones are still tried.
+
+    Each round works on whole arrays: expenses larger than their jar's
+    remaining room are dropped, then every jar admits the running-sum prefix
+    that fits and rejects the expense that breaks it. Rounds are only needed
+    while some jar keeps rejecting.
+    """
+    montos = np.asarray(montos, dtype=np.int64)
+    admitido = np.zeros(len(montos), dtype=bool)
+    if len(montos) == 0:
+        return admitido
+    # Few distinct jar names: a dict encodes them faster than sorting strings
+    indice = {}
+    codigos = np.fromiter((indice.setdefault(j, len(indice)) for j in jarrones), dtype=np.intp, count=len(montos))
+    nombres = list(indice)
+    disponible = np.array([-excedente(asignado[j], 0, limites[j]) for j in nombres], dtype=np.int64)
+    # Pending expenses grouped by jar (stable sort keeps the input order inside each jar)
+    pendientes = np.argsort(codigos, kind="stable")
+    while len(pendientes):
+        pendientes = pendientes[montos[pendientes] <= disponible[codigos[pendientes]]]
+        if not len(pendientes):
+            break
+        grupo = codigos[pendientes]
+        inicios = np.flatnonzero(np.r_[True, grupo[1:] != grupo[:-1]])
+        tamaños = np.diff(np.r_[inicios, len(pendientes)])
+        acumulado = np.cumsum(montos[pendientes])
+        acumulado -= np.repeat(acumulado[inicios] - montos[pendientes][inicios], tamaños)
+        posicion = np.arange(len(pendientes)) - np.repeat(inicios, tamaños)
+        no_cabe = acumulado > disponible[grupo]
+        # Position in each jar of the first expense that breaks the running sum
+        corte = np.full(len(nombres), len(montos))
+        np.minimum.at(corte, grupo[no_cabe], posicion[no_cabe])
+        entra = posicion < corte[grupo]
+        admitido[pendientes[entra]] = True
+        np.subtract.at(disponible, grupo[entra], montos[pendientes[entra]])
+        # The breaking expense is rejected; the ones after it go to the next round
+        pendientes = pendientes[posicion > corte[grupo]]
+    return admitido
+
+
+def filas_historial(ingreso, gastos):
+    """Rows to store for one month: the income entry followed by each expense.
+
+    `gastos` yields (jarrón, subcategoría, cents) tuples.
+    """
+    filas = [{"Jarrón": JARRON_INGRESO, "Subcategoría": SUBCATEGORIA_INGRESO, "Centavos": ingreso}]
+    filas.extend({"Jarrón": jarron, "Subcategoría": sub, "Centavos": monto} for jarron, sub, monto in gastos)
+    return filas
+
+
+def validar_gastos(df_asignaciones, df_gastos, claves):
+    """Compare spent vs. jar limit for every (claves..., Jarrón), vectorized.
+
+    `df_asignaciones` has the `claves` columns plus Jarrón and Límite (cents);
+    `df_gastos` has the `claves` columns plus Jarrón and Centavos. Returns the
+    allocations with Gastado, Disponible and Excedido columns added.
+    """
+    gastado = (
+        df_gastos.groupby(list(claves) + ["Jarrón"], sort=False)["Centavos"].sum().rename("Gastado")
+    )
+    resultado = df_asignaciones.join(gastado, on=list(claves) + ["Jarrón"])
+    resultado["Gastado"] = resultado["Gastado"].fillna(0).astype("int64")
+    resultado["Disponible"] = resultado["Límite"] - resultado["Gastado"]
+    resultado["Excedido"] = resultado["Disponible"] < 0
+    return resultado
+
+
+def resumenes_desde_filas(df_filas, por=()):
+    """Long per-month and per-year jar totals from raw history rows (with Centavos).
+
+    Same shape as the store's resumen_mensual()/resumen_anual() (preceded by
+    the `por` columns), so the result can be passed to
+    resumen_mensual_simplificado / resumen_anual_simplificado.
+    """
+    por = list(por)
+    mensual = df_filas.groupby(por + ["Año", "Mes", "Jarrón"], sort=False)["Centavos"].sum().reset_index()
+    mensual.insert(len(por) + 1, "Mes_Num", mensual["Mes"].map(meses_map).fillna(0).astype(int))
+    anual = df_filas.groupby(por + ["Año", "Jarrón"], sort=False)["Centavos"].sum().reset_index()
+    return mensual, anual
@@ -0,0 +1,92 @@
+import math
+
+import streamlit as st
+
+from config_jarrones import porcentajes
+from historial_cache import cargar_tendencias
+from instrumentacion import MedicionRerun
+from tendencias import MESES_PROYECCION, TOTAL_JARRON, VENTANAS
+from usuarios import obtener_historial, usuario_actual
+
+# --- Trends and Forecast Page ---
+# Rolling averages, year-over-year changes, over-budget frequency and a
+# next-month projection for every jar and subcategory of the saved history.
+# Everything is computed once per history version (see historial_cache) and
+# shared by every rerun and session until the next save.
+
+st.set_page_config(page_title="Tendencias · 6 Jarrones", layout="wide")
+st.title("📈 Tendencias y proyecciones")
+
+medicion = MedicionRerun()
+historial = obtener_historial(usuario_actual())
+
+with medicion.seccion("tendencias") as seccion_actual:
+    evolucion, excesos, proyeccion = cargar_tendencias(historial)
+    seccion_actual["filas"] = len(evolucion)
+
+if evolucion.empty:
+    st.info("Aún no hay meses guardados en tu historial. Guarda al menos un mes para ver tendencias.")
+    medicion.cerrar()
+    st.stop()
+
+# --- Series Selection ---
+col_jarron, col_sub = st.columns(2)
+with col_jarron:
+    jarron = st.selectbox("Jarrón", options=list(porcentajes), key="tendencias_jarron")
+with col_sub:
+    subcategorias = [TOTAL_JARRON] + sorted(
+        proyeccion.loc[(proyeccion["Jarrón"] == jarron) & (proyeccion["Subcategoría"] != TOTAL_JARRON), "Subcategoría"]
+    )
+    subcategoria = st.selectbox("Subcategoría", options=subcategorias, key=f"tendencias_sub_{jarron}")
+
+serie = evolucion[(evolucion["Jarrón"] == jarron) & (evolucion["Subcategoría"] == subcategoria)]
+ultimo = serie.iloc[-1]
+proyectado = proyeccion[(proyeccion["Jarrón"] == jarron) & (proyeccion["Subcategoría"] == subcategoria)].iloc[0]
+
+# --- Key Figures ---
+st.subheader(f"{jarron} · {subcategoria}")
+metricas = st.columns(len(VENTANAS) + 2)
+metricas[0].metric(
+    f"Proyección {proyectado['Mes']} {proyectado['Año']}",
+    f"${proyectado['Proyección']:,.2f}",
+    delta=f"{proyectado['Proyección'] - ultimo['Gastado']:,.2f} vs. {ultimo['Mes']}",
+    delta_color="inverse"
+)
+for columna, k in zip(metricas[1:], VENTANAS):
+    columna.metric(f"Promedio {k} meses", f"${ultimo[f'Promedio {k} meses']:,.2f}")
+variacion = ultimo["Variación interanual"]
+metricas[-1].metric(
+    f"Variación interanual ({ultimo['Mes']} {ultimo['Año']})",
+    "Sin datos" if math.isnan(variacion) else f"${variacion:,.2f}", # No month saved a year earlier
+)
+
+# --- Evolution Chart ---
+with medicion.seccion("grafico_tendencias", filas=len(serie)):
+    grafico = serie.assign(Periodo=serie["Año"].astype(str) + "-" + serie["Mes_Num"].astype(str).str.zfill(2))
+    st.line_chart(
+        grafico.set_index("Periodo")[["Gastado"] + [f"Promedio {k} meses" for k in VENTANAS]],
+        y_label="Monto ($)"
+    )
+
+    with st.expander("Ver datos mensuales"):
+        st.dataframe(
+            serie.drop(columns=["Mes_Num", "Jarrón", "Subcategoría"]).iloc[::-1],
+            hide_index=True,
+            width="stretch"
+        )
+
+# --- Over-Budget Frequency ---
+st.subheader("🚨 Frecuencia de exceso por jarrón")
+st.caption("Meses en los que el jarrón gastó más que su porcentaje del ingreso de ese mes.")
+st.dataframe(excesos, hide_index=True, width="stretch")
+
+# --- Next-Month Projection ---
+st.subheader(f"🔮 Proyección para {proyectado['Mes']} {proyectado['Año']}")
+st.caption(f"Tendencia lineal de los meses guardados en los últimos {MESES_PROYECCION}; nunca negativa.")
+st.dataframe(
+    proyeccion[proyeccion["Jarrón"] == jarron].drop(columns=["Jarrón", "Año", "Mes"]),
+    hide_index=True,
+    width="stretch"
+)
+
+medicion.cerrar()
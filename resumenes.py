@@ -0,0 +1,77 @@
+from dinero import a_pesos
+
+# --- History Summaries ---
+# Turns the per-month / per-year jar totals kept by the history store (long
+# format, int64 cents) into the simplified tables shown in the app and
+# written to the Excel export. Amounts stay in cents until the final columns.
+
+JARRON_INGRESO = "Ingreso Mensual"
+
+COLUMNAS_RESUMEN_MENSUAL = ["Año", "Mes", "Ingreso Mensual", "Total Gastado del Mes", "Saldo Mensual"]
+COLUMNAS_RESUMEN_ANUAL = ["Año", "Ingreso Total Anual", "Total Gastado del Año", "Saldo Anual"]
+
+
+def _pivotar(df, index, jarrones):
+    # Pivot the table to have Jarrón names as columns (int64 cents: exact sums)
+    df_pivot = df.pivot_table(
+        index=index,
+        columns="Jarrón",
+        values="Centavos",
+        aggfunc="sum",
+        fill_value=0
+    ).reset_index()
+    df_pivot.columns.name = None
+    # Ensure all expected jar columns exist
+    for col in [JARRON_INGRESO] + list(jarrones):
+        if col not in df_pivot.columns:
+            df_pivot[col] = 0
+    return df_pivot
+
+
+def resumen_mensual_simplificado(df_mensual, jarrones, por=()):
+    """Año, Mes, income, total spent and balance per month (pesos), sorted by date.
+
+    `por` adds leading grouping columns (e.g. ["Hogar"] in the batch CLI).
+    """
+    por = list(por)
+    if df_mensual.empty:
+        import pandas as pd
+
+        return pd.DataFrame(columns=por + COLUMNAS_RESUMEN_MENSUAL)
+    df_pivot = _pivotar(df_mensual, por + ["Año", "Mes_Num", "Mes"], jarrones)
+    # Total spent excludes Ingreso Mensual
+    df_pivot["Total Gastado del Mes"] = df_pivot[list(jarrones)].sum(axis=1)
+    df_pivot["Saldo Mensual"] = df_pivot[JARRON_INGRESO] - df_pivot["Total Gastado del Mes"]
+    df_pivot = df_pivot.sort_values(by=por + ["Año", "Mes_Num"])
+    df_simplificado = df_pivot[por + COLUMNAS_RESUMEN_MENSUAL].reset_index(drop=True)
+    for col in COLUMNAS_RESUMEN_MENSUAL[2:]:
+        df_simplificado[col] = a_pesos(df_simplificado[col])
+    return df_simplificado
+
+
+def resumen_anual_simplificado(df_anual, jarrones, por=()):
+    """Año, income, total spent and balance per year (pesos), sorted by year."""
+    por = list(por)
+    if df_anual.empty:
+        import pandas as pd
+
+        return pd.DataFrame(columns=por + COLUMNAS_RESUMEN_ANUAL)
+    df_pivot = _pivotar(df_anual, por + ["Año"], jarrones)
+    df_pivot["Total Gastado del Año"] = df_pivot[list(jarrones)].sum(axis=1)
+    # The income jar summed per year is the annual income
+    df_pivot["Ingreso Total Anual"] = df_pivot[JARRON_INGRESO]
+    df_pivot["Saldo Anual"] = df_pivot["Ingreso Total Anual"] - df_pivot["Total Gastado del Año"]
+    df_pivot = df_pivot.sort_values(by=por + ["Año"])
+    df_simplificado = df_pivot[por + COLUMNAS_RESUMEN_ANUAL].reset_index(drop=True)
+    for col in COLUMNAS_RESUMEN_ANUAL[1:]:
+        df_simplificado[col] = a_pesos(df_simplificado[col])
+    return df_simplificado
+
+
+def filtrar_años(df, año_desde=None, año_hasta=None):
+    """Rows of a summary frame whose Año lies in [año_desde, año_hasta]."""
+    if año_desde is not None:
+        df = df[df["Año"] >= año_desde]
+    if año_hasta is not None:
+        df = df[df["Año"] <= año_hasta]
+    return df
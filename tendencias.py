@@ -0,0 +1,166 @@
+import numpy as np
+
+from config_jarrones import meses_map, porcentajes
+from dinero import a_pesos
+from motor_jarrones import repartir_ingresos
+from resumenes import JARRON_INGRESO
+
+# --- Trends and Forecast ---
+# Analytics over the stored monthly aggregates (Año, Mes_Num, Jarrón,
+# Subcategoría, Centavos), computed for every jar total and every subcategory
+# at once. The history is laid out as a (month x series) int64 matrix on a
+# calendar grid from the first to the last stored month; months that were never
+# saved are gaps, not zeros. Rolling averages come from one cumulative sum of
+# that matrix (each window is a difference of two prefix sums), year-over-year
+# deltas from a 12-row shift and the projection from a least-squares line fitted
+# to every series in one pass.
+
+VENTANAS = (3, 6, 12)
+MESES_PROYECCION = 12
+TOTAL_JARRON = "Total del jarrón"
+
+COLUMNAS_EVOLUCION = (
+    ["Año", "Mes_Num", "Mes", "Jarrón", "Subcategoría", "Gastado"]
+    + [f"Promedio {k} meses" for k in VENTANAS]
+    + ["Variación interanual"]
+)
+COLUMNAS_EXCESOS = ["Jarrón", "Meses registrados", "Meses excedidos", "Frecuencia de exceso (%)", "Exceso promedio"]
+COLUMNAS_PROYECCION = ["Jarrón", "Subcategoría", "Año", "Mes", "Proyección", f"Promedio {VENTANAS[0]} meses"]
+
+_NOMBRES_MES = {numero: nombre for nombre, numero in meses_map.items()}
+
+
+def _vacio():
+    import pandas as pd
+
+    return (
+        pd.DataFrame(columns=COLUMNAS_EVOLUCION),
+        pd.DataFrame(columns=COLUMNAS_EXCESOS),
+        pd.DataFrame(columns=COLUMNAS_PROYECCION),
+    )
+
+
+def _promedios_moviles(valores, registrado, ventana):
+    # Mean over the recorded months among the last `ventana`; NaN when there are none
+    n = len(valores)
+    acumulado = np.vstack([np.zeros((1, valores.shape[1]), dtype=np.int64), np.cumsum(valores, axis=0)])
+    cuenta = np.concatenate([[0], np.cumsum(registrado)])
+    desde = np.maximum(np.arange(1, n + 1) - ventana, 0)
+    meses = (cuenta[1:] - cuenta[desde]).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (acumulado[1:] - acumulado[desde]) / meses[:, None]
+
+
+def _proyectar(valores, registrado):
+    # Least-squares line per series over the recorded months of the last
+    # MESES_PROYECCION, evaluated one month after the last one; with a single
+    # point the projection is that month's value. Never negative.
+    n = len(valores)
+    inicio = max(n - MESES_PROYECCION, 0)
+    x = np.arange(inicio, n)[registrado[inicio:]].astype(np.float64)
+    y = valores[inicio:][registrado[inicio:]].astype(np.float64)
+    x_medio = x.mean()
+    y_medio = y.mean(axis=0)
+    dispersion = ((x - x_medio) ** 2).sum()
+    pendiente = ((x - x_medio)[:, None] * (y - y_medio)).sum(axis=0) / dispersion if dispersion else 0.0
+    return np.maximum(y_medio + pendiente * (n - x_medio), 0.0)
+
+
+def analizar(mensual, jarrones=porcentajes):
+    """(evolucion, excesos, proyeccion) DataFrames for monthly aggregates in cents.
+
+    evolucion: one row per stored month and series (every jar total, with
+        Subcategoría TOTAL_JARRON, and every subcategory) with the amount spent,
+        the rolling averages over VENTANAS months and the change against the
+        same month of the previous year.
+    excesos: per jar, how many stored months spent more than the jar's share
+        of that month's income (`porcentajes`) and by how much on average.
+    proyeccion: per series, the projected amount for the month after the last
+        stored one.
+
+    Amounts are returned in pesos.
+    """
+    import pandas as pd
+
+    jarrones = list(jarrones)
+    mensual = mensual[mensual["Mes_Num"] > 0]
+    if mensual.empty:
+        return _vacio()
+    periodo = mensual["Año"].to_numpy(dtype=np.int64) * 12 + mensual["Mes_Num"].to_numpy(dtype=np.int64) - 1
+    primero = int(periodo.min())
+    n = int(periodo.max()) - primero + 1
+    fila = periodo - primero
+    centavos = mensual["Centavos"].to_numpy(dtype=np.int64)
+    jarron = mensual["Jarrón"].astype(str).to_numpy()
+    registrado = np.zeros(n, dtype=bool)
+    registrado[fila] = True
+
+    # Series: the jar totals first, then every (jarrón, subcategoría) seen
+    es_ingreso = jarron == JARRON_INGRESO
+    codigo_jarron = pd.Categorical(jarron, categories=jarrones).codes
+    es_gasto = codigo_jarron >= 0
+    pares = pd.MultiIndex.from_arrays(
+        [jarron[es_gasto], mensual["Subcategoría"].astype(str).to_numpy()[es_gasto]]
+    )
+    orden = {j: i for i, j in enumerate(jarrones)}
+    subcategorias = sorted(pares.unique(), key=lambda par: (orden[par[0]], par[1]))
+    codigo_sub = pd.MultiIndex.from_tuples(subcategorias).get_indexer(pares) if subcategorias else np.zeros(0, np.intp)
+    claves = [(j, TOTAL_JARRON) for j in jarrones] + subcategorias
+    valores = np.zeros((n, len(claves)), dtype=np.int64)
+    np.add.at(valores, (fila[es_gasto], codigo_jarron[es_gasto]), centavos[es_gasto])
+    np.add.at(valores, (fila[es_gasto], len(jarrones) + codigo_sub), centavos[es_gasto])
+    ingresos = np.zeros(n, dtype=np.int64)
+    np.add.at(ingresos, fila[es_ingreso], centavos[es_ingreso])
+
+    promedios = [_promedios_moviles(valores, registrado, k) for k in VENTANAS]
+    interanual = np.full(valores.shape, np.nan)
+    if n > 12:
+        ambos = registrado[12:] & registrado[:-12]
+        interanual[12:][ambos] = (valores[12:] - valores[:-12])[ambos]
+
+    # Evolution table: stored months only, series in `claves` order
+    meses = np.flatnonzero(registrado)
+    indice_mes = np.repeat(meses, len(claves))
+    indice_serie = np.tile(np.arange(len(claves)), len(meses))
+    años, numeros = np.divmod(meses + primero, 12)
+    evolucion = pd.DataFrame({
+        "Año": np.repeat(años, len(claves)),
+        "Mes_Num": np.repeat(numeros + 1, len(claves)),
+        "Mes": pd.Categorical.from_codes(np.repeat(numeros, len(claves)), [_NOMBRES_MES[m] for m in range(1, 13)]),
+        "Jarrón": pd.Categorical.from_codes(
+            np.array([jarrones.index(j) for j, _ in claves])[indice_serie], jarrones
+        ),
+        "Subcategoría": np.array([s for _, s in claves], dtype=object)[indice_serie],
+        "Gastado": a_pesos(valores[indice_mes, indice_serie]),
+        **{
+            f"Promedio {k} meses": np.round(a_pesos(promedio[indice_mes, indice_serie]), 2)
+            for k, promedio in zip(VENTANAS, promedios)
+        },
+        "Variación interanual": a_pesos(interanual[indice_mes, indice_serie]),
+    }, columns=COLUMNAS_EVOLUCION)
+
+    # Over-budget frequency: jar totals against the exact split of each month's income
+    limites = repartir_ingresos(ingresos[meses])[:, [list(porcentajes).index(j) for j in jarrones]]
+    exceso = valores[meses, :len(jarrones)] - limites
+    excedido = exceso > 0
+    veces = excedido.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        exceso_promedio = np.where(excedido, exceso, 0).sum(axis=0) / veces
+    excesos = pd.DataFrame({
+        "Jarrón": jarrones,
+        "Meses registrados": len(meses),
+        "Meses excedidos": veces,
+        "Frecuencia de exceso (%)": np.round(veces / len(meses) * 100, 1),
+        "Exceso promedio": np.round(a_pesos(exceso_promedio), 2),
+    }, columns=COLUMNAS_EXCESOS)
+
+    año_siguiente, mes_siguiente = divmod(primero + n, 12)
+    proyeccion = pd.DataFrame({
+        "Jarrón": [j for j, _ in claves],
+        "Subcategoría": [s for _, s in claves],
+        "Año": año_siguiente,
+        "Mes": _NOMBRES_MES[mes_siguiente + 1],
+        "Proyección": np.round(a_pesos(_proyectar(valores, registrado)), 2),
+        f"Promedio {VENTANAS[0]} meses": np.round(a_pesos(promedios[0][-1]), 2),
+    }, columns=COLUMNAS_PROYECCION)
+    return evolucion, excesos, proyeccion
@@ -0,0 +1,27 @@
+import os
+
+import streamlit as st
+
+from historial_store import USUARIO_LOCAL, abrir_historial
+
+# --- Users and Their History Stores ---
+# Each user has a separate history partition. The user is the logged-in account
+# when Streamlit authentication is configured, or the value of the header named
+# by JARRONES_CABECERA_USUARIO when an authenticating proxy sets one; otherwise
+# everyone shares the local history (single-user deployments). Shared by the
+# main app and the pages under pages/.
+
+
+def usuario_actual():
+    if st.user.get("is_logged_in"):
+        return st.user.get("email") or st.user.get("sub")
+    cabecera = os.environ.get("JARRONES_CABECERA_USUARIO")
+    if cabecera and st.context.headers.get(cabecera):
+        return st.context.headers[cabecera]
+    return USUARIO_LOCAL
+
+
+# One store per user and server process, shared by that user's sessions and pages
+@st.cache_resource
+def obtener_historial(usuario):
+    return abrir_historial(usuario=usuario)